@@ -0,0 +1,75 @@
+""" Builds or incrementally refreshes the on-disk index of breed images """
+
+import argparse
+import json
+import sys
+import time
+import requests
+import utils.image_index as image_index
+
+DEFAULT_INDEX = image_index.DEFAULT_INDEX_PATH
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The parsed arguments
+    :rtype: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--index', default=DEFAULT_INDEX,
+        help=f'The index file to refresh (default: {DEFAULT_INDEX})'
+    )
+    parser.add_argument(
+        '--host', default='https://dog.ceo',
+        help='Host of the Dog API (default: https://dog.ceo)'
+    )
+    parser.add_argument(
+        '--max-age', type=float, default=0,
+        help='Seconds a breed is considered up to date for and not '
+             'requested again (default: 0, always check)'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=image_index.DEFAULT_MAX_WORKERS,
+        help='Number of concurrent requests (default: '
+             f'{image_index.DEFAULT_MAX_WORKERS})'
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Refreshes the index and saves it
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The exit code
+    :rtype: int
+    """
+
+    args = parse_args(argv)
+    api_endpoint = f'{args.host.rstrip("/")}/api'
+    response = requests.get(f'{api_endpoint}/breeds/list/all')
+    response.raise_for_status()
+    index = image_index.ImageIndex.load(args.index)
+    start = time.perf_counter()
+    changed = index.refresh(
+        api_endpoint, json.loads(response.text), max_age=args.max_age,
+        max_workers=args.workers
+    )
+    index.save(args.index)
+    images = sum(meta['count'] for meta in index.breeds.values())
+    print(f'{args.index}: {len(index.breeds)} breeds, {images} images, '
+          f'{changed} breeds changed in {time.perf_counter() - start:.1f}s')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+""" Compares two Locust runs and exits non-zero on a performance regression """
+
+import argparse
+import sys
+import utils.regression as regression
+import utils.results as results
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The parsed arguments
+    :rtype: argparse.Namespace
+    """
+
+    limits = regression.DEFAULT_THRESHOLDS
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'baseline',
+        help='Baseline run prefix, i.e. results/ten_users_four_minutes, '
+             'or the path to one of its CSV files'
+    )
+    parser.add_argument('candidate', help='Candidate run prefix or CSV file')
+    parser.add_argument(
+        '--max-p95-increase', type=float,
+        default=limits['p95_increase_pct'],
+        help='Allowed p95 latency increase per route, in percent'
+    )
+    parser.add_argument(
+        '--max-p99-increase', type=float,
+        default=limits['p99_increase_pct'],
+        help='Allowed p99 latency increase per route, in percent'
+    )
+    parser.add_argument(
+        '--max-error-rate-increase', type=float,
+        default=limits['error_rate_increase_pct'],
+        help='Allowed error rate increase per route, in percentage points'
+    )
+    parser.add_argument(
+        '--max-throughput-decrease', type=float,
+        default=limits['throughput_decrease_pct'],
+        help='Allowed aggregated requests/s decrease, in percent'
+    )
+    parser.add_argument(
+        '--alpha', type=float, default=limits['alpha'],
+        help='Significance level of the statistical tests'
+    )
+    parser.add_argument(
+        '--min-requests', type=int, default=limits['min_requests'],
+        help='Routes with fewer requests in either run are not gated'
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Compares the baseline and candidate runs, prints a per-route report and
+    returns the exit code
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: 0 if no regression was found, 1 on a regression, 2 if a run's
+             stats file is missing
+    :rtype: int
+    """
+
+    args = parse_args(argv)
+    fmt = results.format_value
+    thresholds = {
+        'p95_increase_pct': args.max_p95_increase,
+        'p99_increase_pct': args.max_p99_increase,
+        'error_rate_increase_pct': args.max_error_rate_increase,
+        'throughput_decrease_pct': args.max_throughput_decrease,
+        'alpha': args.alpha,
+        'min_requests': args.min_requests
+    }
+    base_files = results.get_run_files(args.baseline)
+    cand_files = results.get_run_files(args.candidate)
+    for run, run_files in ((args.baseline, base_files),
+                           (args.candidate, cand_files)):
+        if run_files['stats'] is None:
+            print(f'No {results.STATS_SUFFIX} file found for {run}',
+                  file=sys.stderr)
+            return 2
+
+    report = regression.compare_routes(
+        results.read_locust_csv(base_files['stats']),
+        results.read_locust_csv(cand_files['stats']),
+        thresholds
+    )
+    regressed = False
+    print(f'{"Route":<52} {"reqs":>13} {"p95 ms":>11} {"p99 ms":>11} '
+          f'{"err %":>11}  result')
+    for result in report:
+        if 'requests' not in result:
+            print(f'{result["route"]:<52} {result["note"]}')
+            continue
+        regressed = regressed or bool(result['regressions'])
+        verdict = 'REGRESSED ' + ','.join(result['regressions']) \
+            if result['regressions'] else result.get('note', 'ok')
+        print(
+            f'{result["route"]:<52} '
+            f'{"/".join(str(n) for n in result["requests"]):>13} '
+            f'{"/".join(fmt(v) for v in result["p95"]):>11} '
+            f'{"/".join(fmt(v) for v in result["p99"]):>11} '
+            f'{"/".join(fmt(v, ".1f") for v in result["error_rate"]):>11}  '
+            f'{verdict}'
+        )
+
+    if base_files['history'] and cand_files['history']:
+        throughput = regression.compare_throughput(
+            results.read_locust_csv(base_files['history']),
+            results.read_locust_csv(cand_files['history']),
+            thresholds
+        )
+        regressed = regressed or throughput['regressed']
+        rates = '/'.join(
+            fmt(v, '.2f') for v in throughput['requests_per_sec']
+        )
+        print(
+            f'Aggregated requests/s {rates} '
+            f'(p={throughput["p_value"]:.3f}) '
+            f'{"REGRESSED" if throughput["regressed"] else "ok"}'
+        )
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
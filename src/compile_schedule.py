@@ -0,0 +1,105 @@
+""" Compiles a seeded request schedule for DogAPIReplayUser to replay """
+
+import argparse
+import json
+import sys
+import requests
+import utils.schedule as schedule
+
+
+def _positive_int(value):
+    """
+    Command line type of the schedule sizes
+
+    :param value: The command line value
+    :type value: str
+    :return: The value as an int of at least 1
+    :rtype: int
+    """
+
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            f'expected a whole number of at least 1, got {value!r}'
+        )
+
+    return number
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The parsed arguments
+    :rtype: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('out', help='The schedule file to write')
+    parser.add_argument(
+        '--users', type=_positive_int, default=100,
+        help='Number of distinct user streams (default: 100)'
+    )
+    parser.add_argument(
+        '--requests-per-user', type=_positive_int, default=1000,
+        help='Requests in each user stream, streams start over once '
+             'replayed (default: 1000)'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0, help='Random seed (default: 0)'
+    )
+    parser.add_argument(
+        '--list-all',
+        help='A saved /breeds/list/all JSON response to compile from, '
+             'instead of requesting it from --host'
+    )
+    parser.add_argument(
+        '--host', default='https://dog.ceo',
+        help='Host to request /api/breeds/list/all from '
+             '(default: https://dog.ceo)'
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Compiles and writes the schedule
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The exit code
+    :rtype: int
+    """
+
+    args = parse_args(argv)
+    if args.list_all:
+        with open(args.list_all) as json_file:
+            list_all_dict = json.load(json_file)
+    else:
+        response = requests.get(
+            f'{args.host.rstrip("/")}/api{schedule.LIST_ALL_EP}'
+        )
+        response.raise_for_status()
+        list_all_dict = json.loads(response.text)
+
+    urls, records = schedule.compile_schedule(
+        list_all_dict, args.users, args.requests_per_user, args.seed
+    )
+    schedule.write_schedule(
+        args.out, urls, records, args.users, args.requests_per_user,
+        args.seed
+    )
+    print(f'{args.out}: {args.users} users x {args.requests_per_user} '
+          f'requests, {len(urls)} distinct urls, seed {args.seed}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
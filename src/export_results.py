@@ -0,0 +1,62 @@
+""" Exports Locust CSV results to typed, memory-mappable columnar files """
+
+import argparse
+import os
+import sys
+import utils.columnar as columnar
+import utils.results as results
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The parsed arguments
+    :rtype: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'runs', nargs='*', default=['results'],
+        help='Run prefixes, i.e. results/ten_users_four_minutes, or '
+             'directories to export every run of (default: results)'
+    )
+    parser.add_argument(
+        '--out', default=os.path.join('results', 'columnar'),
+        help='Directory to write one subdirectory per run to '
+             '(default: results/columnar)'
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Exports every run given on the command line
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: 0 if at least one run was exported, 1 otherwise
+    :rtype: int
+    """
+
+    args = parse_args(argv)
+    runs = results.expand_runs(args.runs)
+
+    for run in runs:
+        manifest = columnar.export_run(
+            run, os.path.join(args.out, os.path.basename(run))
+        )
+        rows = ', '.join(
+            f'{table} {description["rows"]}'
+            for table, description in manifest['tables'].items()
+        )
+        print(f'{manifest["run"]}: {rows} rows, {manifest["parameters"]}')
+
+    return 0 if runs else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
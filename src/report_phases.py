@@ -0,0 +1,94 @@
+""" Reports the ramp-up, steady-state and cool-down phases of Locust runs """
+
+import argparse
+import os
+import sys
+import utils.phases as phases
+import utils.results as results
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line arguments
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: The parsed arguments
+    :rtype: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'runs', nargs='*', default=['results'],
+        help='Run prefixes, i.e. results/ten_users_four_minutes, or '
+             'directories to report every run of (default: results)'
+    )
+    parser.add_argument(
+        '--warm-up', type=phases.parse_warm_up, default='auto',
+        help='Seconds of ramp-up before the steady state, or "auto" to '
+             'detect it (default: auto)'
+    )
+    parser.add_argument(
+        '--steady-window', type=float, default=phases.DEFAULT_STEADY_WINDOW,
+        help='Seconds the requests/s has to be stable for (default: '
+             f'{phases.DEFAULT_STEADY_WINDOW})'
+    )
+    parser.add_argument(
+        '--steady-tolerance', type=float,
+        default=phases.DEFAULT_STEADY_TOLERANCE,
+        help='Largest coefficient of variation of the requests/s that is '
+             f'stable (default: {phases.DEFAULT_STEADY_TOLERANCE})'
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Splits the stats history of every run given on the command line into
+    phases and prints a summary of each
+
+    :param argv: The arguments to parse, defaults to sys.argv[1:]
+    :type argv: list
+    :return: 0 if at least one run was reported, 1 otherwise
+    :rtype: int
+    """
+
+    args = parse_args(argv)
+    fmt = results.format_value
+    runs = results.expand_runs(args.runs)
+
+    reported = 0
+    for run in runs:
+        history = results.get_run_files(run)['history']
+        if history is None:
+            print(f'No {results.HISTORY_SUFFIX} file found for {run}',
+                  file=sys.stderr)
+            continue
+        summaries = phases.summarise_history(
+            results.read_locust_csv(history),
+            warm_up=None if args.warm_up == 'auto' else args.warm_up,
+            window_secs=args.steady_window,
+            tolerance=args.steady_tolerance
+        )
+        reported += 1
+        print(f'{os.path.basename(run)}')
+        print(f'  {"Phase":<14} {"secs":>6} {"reqs":>7} {"fails":>6} '
+              f'{"req/s":>7} {"p50 ms":>7} {"p95 ms":>7}')
+        for phase in phases.PHASES:
+            summary = summaries[phase]
+            if summary is None:
+                print(f'  {phase:<14} not reached')
+                continue
+            print(
+                f'  {phase:<14} {summary["end"] - summary["start"]:>6} '
+                f'{summary["requests"]:>7} {summary["failures"]:>6} '
+                f'{fmt(summary["requests_per_sec"], ".2f"):>7} '
+                f'{fmt(summary["50%"]):>7} {fmt(summary["95%"]):>7}'
+            )
+
+    return 0 if reported else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+""" Unit tests of the steady state detection in utils.phases """
+
+import unittest
+import utils.phases as phases
+
+
+def get_steady_at(detector, rates, interval=1.0):
+    """
+    :param detector: The detector to add the samples to
+    :type detector: phases.SteadyStateDetector
+    :param rates: The requests/s sampled, one per interval
+    :type rates: list
+    :param interval: The seconds between the samples
+    :type interval: float
+    :return: The seconds into the samples the steady state was detected at,
+             None if it was not
+    :rtype: float
+    """
+
+    for idx, rate in enumerate(rates):
+        if detector.add(idx * interval, rate):
+            return idx * interval
+
+    return None
+
+
+class TestSteadyStateDetector(unittest.TestCase):
+    """
+    Test cases of phases.SteadyStateDetector
+    """
+
+    def test_short_windows_are_reached(self):
+        """ A constant requests/s is steady after windows under 10 secs """
+        for window in (2, 5, 8, 9):
+            with self.subTest(window=window):
+                detector = phases.SteadyStateDetector(window_secs=window)
+                self.assertEqual(get_steady_at(detector, [10.0] * 30), window)
+
+    def test_window_is_reached_with_sparse_samples(self):
+        """ Samples further apart than the window still span it """
+        detector = phases.SteadyStateDetector(window_secs=30)
+        self.assertEqual(
+            get_steady_at(detector, [10.0] * 10, interval=7.0), 35.0
+        )
+
+    def test_climbing_rate_is_not_steady(self):
+        """ A requests/s still climbing over the window is not steady """
+        detector = phases.SteadyStateDetector(window_secs=10)
+        self.assertIsNone(
+            get_steady_at(detector, [float(rate) for rate in range(1, 30)])
+        )
+
+    def test_ramping_drops_the_samples(self):
+        """ Samples taken while users are started are not counted """
+        detector = phases.SteadyStateDetector(window_secs=5)
+        for timestamp in range(10):
+            self.assertFalse(detector.add(timestamp, 10.0, ramping=True))
+        self.assertFalse(detector.add(10, 10.0))
+        self.assertEqual(len(detector.samples), 1)
+
+    def test_no_requests_is_not_steady(self):
+        """ A run without requests is not steady """
+        detector = phases.SteadyStateDetector(window_secs=5)
+        self.assertIsNone(get_steady_at(detector, [0.0] * 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+""" Unit tests of the run to run regression checks in utils.regression """
+
+import unittest
+import utils.regression as regression
+
+ROUTE = 'https://dog.ceo/api/breed/hound/images/random/3'
+BASE_PERCENTILES = {
+    'Min Response Time': 40, '50%': 60, '66%': 70, '75%': 80, '80%': 90,
+    '90%': 110, '95%': 150, '98%': 180, '99%': 200, '99.9%': 200,
+    '99.99%': 200, '99.999%': 200, '100%': 200
+}
+
+
+def get_stats_row(requests, failures=0, tail=None):
+    """
+    :param requests: The request count of the row
+    :type requests: int
+    :param failures: The failure count of the row
+    :type failures: int
+    :param tail: A (column, latency) tuple, i.e. ('99%', 800), setting the
+                 column and every higher percentile to the latency
+    :type tail: tuple
+    :return: A row as read from a *_stats.csv file
+    :rtype: dict
+    """
+
+    row = dict(BASE_PERCENTILES)
+    if tail is not None:
+        columns = list(BASE_PERCENTILES)
+        for column in columns[columns.index(tail[0]):]:
+            row[column] = tail[1]
+    row.update({
+        'Name': ROUTE, 'Request Count': requests, 'Failure Count': failures
+    })
+
+    return row
+
+
+def get_route_result(base_row, cand_row):
+    """
+    :return: The compare_routes() result of the one route of the rows
+    :rtype: dict
+    """
+
+    return regression.compare_routes([base_row], [cand_row])[0]
+
+
+class TestWeightedPercentile(unittest.TestCase):
+    """
+    Test cases of regression.weighted_percentile()
+    """
+
+    def test_uniform_weights(self):
+        """ Equal weights give the plain percentiles """
+        samples = [(value, 1) for value in range(1, 101)]
+        self.assertEqual(regression.weighted_percentile(samples, 50), 50)
+        self.assertEqual(regression.weighted_percentile(samples, 95), 95)
+        self.assertEqual(regression.weighted_percentile(samples, 100), 100)
+
+    def test_rebuilt_distribution_returns_recorded_percentiles(self):
+        """ A distribution rebuilt from a stats row keeps its percentiles """
+        samples = regression.get_route_distributions(
+            [get_stats_row(5000)]
+        )['/api/breed/{breed}/images/random/{n}']['samples']
+        self.assertEqual(regression.weighted_percentile(samples, 95), 150)
+        self.assertEqual(regression.weighted_percentile(samples, 99), 200)
+
+    def test_no_samples(self):
+        """ No samples have no percentile """
+        self.assertIsNone(regression.weighted_percentile([], 95))
+
+
+class TestTailGreater(unittest.TestCase):
+    """
+    Test cases of regression.tail_greater()
+    """
+
+    def test_larger_tail_is_significant(self):
+        """ A larger share above the threshold is significant """
+        baseline = [(100, 990), (200, 10)]
+        candidate = [(100, 960), (800, 40)]
+        self.assertLess(
+            regression.tail_greater(baseline, candidate, 100), 0.001
+        )
+
+    def test_same_tail_is_not_significant(self):
+        """ The same share above the threshold is not significant """
+        samples = [(100, 990), (200, 10)]
+        self.assertGreater(
+            regression.tail_greater(samples, samples, 100), 0.4
+        )
+
+    def test_empty_sample(self):
+        """ An empty sample is never significant """
+        self.assertEqual(regression.tail_greater([], [(1, 1)], 0), 1.0)
+
+
+class TestTwoProportionGreater(unittest.TestCase):
+    """
+    Test cases of regression.two_proportion_greater()
+    """
+
+    def test_higher_failure_rate_is_significant(self):
+        """ A higher candidate failure rate is significant """
+        self.assertLess(
+            regression.two_proportion_greater(10, 1000, 50, 1000), 0.001
+        )
+
+    def test_lower_failure_rate_is_not_significant(self):
+        """ A lower candidate failure rate is not significant """
+        self.assertGreater(
+            regression.two_proportion_greater(50, 1000, 10, 1000), 0.99
+        )
+
+    def test_undefined(self):
+        """ Empty or failure free samples are never significant """
+        self.assertEqual(regression.two_proportion_greater(0, 0, 1, 1), 1.0)
+        self.assertEqual(
+            regression.two_proportion_greater(0, 10, 0, 10), 1.0
+        )
+
+
+class TestWelchLess(unittest.TestCase):
+    """
+    Test cases of regression.welch_less()
+    """
+
+    def test_lower_mean_is_significant(self):
+        """ A lower candidate mean is significant """
+        baseline = [20.0, 21.0, 19.0, 20.5, 19.5, 20.0]
+        candidate = [15.0, 16.0, 14.0, 15.5, 14.5, 15.0]
+        self.assertLess(regression.welch_less(baseline, candidate), 0.001)
+
+    def test_higher_mean_is_not_significant(self):
+        """ A higher candidate mean is not significant """
+        baseline = [15.0, 16.0, 14.0]
+        candidate = [20.0, 21.0, 19.0]
+        self.assertGreater(regression.welch_less(baseline, candidate), 0.99)
+
+    def test_constant_samples(self):
+        """ Samples without variance compare their means """
+        self.assertEqual(regression.welch_less([5, 5], [4, 4]), 0.0)
+        self.assertEqual(regression.welch_less([5, 5], [5, 5]), 1.0)
+
+    def test_too_few_samples(self):
+        """ Fewer than two samples are never significant """
+        self.assertEqual(regression.welch_less([1], [1, 2]), 1.0)
+
+
+class TestCompareRoutes(unittest.TestCase):
+    """
+    Test cases of regression.compare_routes()
+    """
+
+    def test_tail_only_p99_regression(self):
+        """ A p99 increase with the same p95 regresses the p99 only """
+        result = get_route_result(
+            get_stats_row(5000),
+            get_stats_row(5000, tail=('99%', 800))
+        )
+        self.assertEqual(result['p99'], (200, 800))
+        self.assertEqual(result['regressions'], ['p99'])
+
+    def test_tail_only_p95_regression(self):
+        """ A p95 increase regresses the p95 and the p99 """
+        result = get_route_result(
+            get_stats_row(5000),
+            get_stats_row(5000, tail=('95%', 400))
+        )
+        self.assertEqual(result['regressions'], ['p95', 'p99'])
+
+    def test_same_run_does_not_regress(self):
+        """ A run compared to itself does not regress """
+        result = get_route_result(get_stats_row(5000), get_stats_row(5000))
+        self.assertEqual(result['regressions'], [])
+
+    def test_too_few_requests_are_not_gated(self):
+        """ Routes with too few requests are reported but not gated """
+        result = get_route_result(
+            get_stats_row(10), get_stats_row(10, tail=('99%', 800))
+        )
+        self.assertEqual(result['regressions'], [])
+        self.assertEqual(result['note'], 'too few requests to gate')
+
+    def test_error_rate_regression(self):
+        """ A higher error rate regresses the error rate """
+        result = get_route_result(
+            get_stats_row(5000, failures=5), get_stats_row(5000, failures=200)
+        )
+        self.assertEqual(result['regressions'], ['error_rate'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,17 @@
 """ Locust file for Dog API testing """
 
+import itertools
 import json
 import random
-from locust import HttpUser, task, between
+import sys
+from locust import HttpUser, task, between, events
+import utils.controller as controller
+import utils.failures as failures
+import utils.image_index as image_index
+import utils.metrics as metrics
+import utils.phases as phases
+import utils.schedule as schedule
+import utils.soak as soak
 import utils.utils as utils
 
 
@@ -12,6 +21,10 @@ class DogAPIUser(HttpUser):
     """
 
     wait_time = between(3, 9)
+    # set to a soak.CappedNames in --soak mode
+    request_names = None
+    # set to an image_index.ImageIndex by --image-index
+    image_index = None
 
     def __init__(self, *args, **kwargs):
         """
@@ -47,6 +60,53 @@ class DogAPIUser(HttpUser):
                     random.choice(
                         [api_ep for api_ep in ab_ep if substr not in api_ep])
 
+    def _get_request_name(self, url):
+        """
+        The name a request is reported under in the stats. Locust uses the
+        url by default, in --soak mode the route template is used instead,
+        i.e. /api/breed/{breed}/images/random/{n}, so the number of stats
+        entries stays bounded.
+
+        :param url: The url requested
+        :type url: str
+        :return: The request name, or None to use the url
+        :rtype: str
+        """
+
+        if self.request_names is None:
+            return None
+
+        return self.request_names.get(utils.get_route_template(url))
+
+    def _get_images(self, url):
+        """
+        Requests an endpoint returning images. With --image-index the
+        request fails if any image returned is not one of the breed's.
+
+        :param url: The /images or /random endpoint
+        :type url: str
+        """
+
+        if self.image_index is None:
+            self.client.get(url, name=self._get_request_name(url))
+            return
+
+        with self.client.get(url, name=self._get_request_name(url),
+                             catch_response=True) as response:
+            if not response.ok:
+                return
+            try:
+                image_urls = json.loads(response.text)['message']
+            except (ValueError, KeyError) as err:
+                response.failure(f'Invalid images response: {err!r}')
+                return
+            foreign = self.image_index.get_foreign_images(url, image_urls)
+            if foreign:
+                response.failure(
+                    f'{len(foreign)} images not of the breed, i.e. '
+                    f'{foreign[0]}'
+                )
+
     @task(3)
     def list_by_breed(self):
         """
@@ -56,14 +116,19 @@ class DogAPIUser(HttpUser):
 
         chosen_endpoint = \
             self._get_random_endpoint_from_list_by_substring('/list')
-        self.client.get(chosen_endpoint)
+        self.client.get(
+            chosen_endpoint, name=self._get_request_name(chosen_endpoint)
+        )
 
     @task(2)
     def list_all_breeds(self):
         """
         Lists all breeds from /breeds/list/all
         """
-        self.client.get(f'{self.api_endpoint}{self.list_breeds_ep}')
+        list_all_ep = f'{self.api_endpoint}{self.list_breeds_ep}'
+        self.client.get(
+            list_all_ep, name=self._get_request_name(list_all_ep)
+        )
 
     @task(3)
     def get_random_image(self):
@@ -73,7 +138,7 @@ class DogAPIUser(HttpUser):
 
         chosen_endpoint = \
             self._get_random_endpoint_from_list_by_substring('/random')
-        self.client.get(chosen_endpoint)
+        self._get_images(chosen_endpoint)
 
     @task(4)
     def get_random_images(self):
@@ -85,7 +150,8 @@ class DogAPIUser(HttpUser):
         random_no_images = random.randint(2, 60)
         chosen_endpoint = \
             self._get_random_endpoint_from_list_by_substring('/random')
-        self.client.get(f'{chosen_endpoint}/{random_no_images}')
+        random_images_ep = f'{chosen_endpoint}/{random_no_images}'
+        self._get_images(random_images_ep)
 
     @task(2)
     def get_list_of_images(self):
@@ -95,7 +161,7 @@ class DogAPIUser(HttpUser):
 
         chosen_endpoint = \
             self._get_random_endpoint_from_list_by_substring('/images')
-        self.client.get(chosen_endpoint)
+        self._get_images(chosen_endpoint)
 
     def on_start(self):
         """
@@ -104,9 +170,196 @@ class DogAPIUser(HttpUser):
 
         # gets all available /breed && /sub-breed endpoints such as
         # /list, /images, /random
+        list_all_ep = f'{self.api_endpoint}{self.list_breeds_ep}'
         response = self.client.get(
-            f'{self.api_endpoint}{self.list_breeds_ep}'
+            list_all_ep, name=self._get_request_name(list_all_ep)
         )
         self.all_breeds_ep = \
             utils.get_all_available_breed_endpoints_from_list_all(
                 self.api_endpoint, json.loads(response.content))
+
+
+class DogAPIReplayUser(HttpUser):
+    """
+    HttpUser class for Locust, replays the requests and wait times of a
+    schedule compiled by compile_schedule.py instead of choosing them at
+    runtime. Selected with --schedule.
+    """
+
+    abstract = True
+    # set to a schedule.Schedule by --schedule
+    schedule = None
+    user_ids = itertools.count()
+
+    def __init__(self, *args, **kwargs):
+        """
+        Inherits from HttpUser and claims the next user stream of the
+        schedule
+        """
+
+        super(DogAPIReplayUser, self).__init__(*args, **kwargs)
+        self.stream = self.schedule.get_stream(next(self.user_ids))
+
+    def wait_time(self):
+        """
+        :return: The wait after the last request, as compiled
+        :rtype: float
+        """
+
+        return self.stream.wait
+
+    @task
+    def replay_request(self):
+        """
+        Requests the next url of the user's stream
+        """
+
+        url, name = self.stream.next()
+        self.client.get(url, name=name)
+
+
+@events.init_command_line_parser.add_listener
+def on_init_command_line_parser(parser, **_kwargs):
+    """
+    Adds the Dog API suite's command line options to Locust's
+    """
+
+    parser.add_argument(
+        '--soak', action='store_true', default=False,
+        help='Soak test mode, keeps memory flat for multi-hour runs by '
+             'capping the stats entries and writing fixed size time windows '
+             'to [CSV_PREFIX]_soak_windows.csv'
+    )
+    parser.add_argument(
+        '--soak-max-entries', type=int, default=50,
+        help='Maximum distinct request names in --soak mode, further names '
+             'are reported as "Other"'
+    )
+    parser.add_argument(
+        '--soak-window', type=int, default=60,
+        help='Length in seconds of the --soak mode time windows'
+    )
+    parser.add_argument(
+        '--error-budget', type=float, default=None,
+        help='Allowed failure ratio per route, i.e. 0.01. The run stops with '
+             'exit code 1 as soon as a route fails more often'
+    )
+    parser.add_argument(
+        '--error-budget-min-requests', type=int, default=100,
+        help='Requests a route needs before its --error-budget is checked'
+    )
+    parser.add_argument(
+        '--failure-window', type=int, default=60,
+        help='Length in seconds of the windows failures are clustered in, '
+             'clusters are written to [CSV_PREFIX]_failure_clusters.csv'
+    )
+    parser.add_argument(
+        '--schedule', default=None,
+        help='Replay a schedule compiled by compile_schedule.py with '
+             'DogAPIReplayUser instead of running DogAPIUser'
+    )
+    parser.add_argument(
+        '--schedule-first-user', type=int, default=0,
+        help='First user stream of the --schedule replayed by this process, '
+             'give each worker a different one'
+    )
+    parser.add_argument(
+        '--image-index', default=None,
+        help='An index built by build_image_index.py, image requests fail '
+             'if they return an image not of the requested breed'
+    )
+    parser.add_argument(
+        '--metrics-port', type=int, default=None,
+        help='Serve live request metrics in the Prometheus text format at '
+             'http://[METRICS_HOST]:[METRICS_PORT]/metrics'
+    )
+    parser.add_argument(
+        '--metrics-host', default='127.0.0.1',
+        help='Address to serve --metrics-port on (default: 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--target-p95', type=float, default=None,
+        help='Adaptive users mode, adjusts the user count to the most that '
+             'keeps the p95 response time under this many milliseconds, '
+             'starting from --users. The control trace and operating point '
+             'are written to [CSV_PREFIX]_control_trace.csv and '
+             '[CSV_PREFIX]_operating_point.json'
+    )
+    parser.add_argument(
+        '--control-interval', type=int, default=10,
+        help='Seconds between user count adjustments with --target-p95'
+    )
+    parser.add_argument(
+        '--max-error-rate', type=float, default=0.01,
+        help='Failure ratio the user count is cut back at with --target-p95'
+    )
+    parser.add_argument(
+        '--adaptive-step', type=int, default=5,
+        help='Users added after an interval within the targets'
+    )
+    parser.add_argument(
+        '--adaptive-backoff', type=float, default=0.75,
+        help='Factor the users are cut by after an interval over the targets'
+    )
+    parser.add_argument(
+        '--max-users', type=int, default=1000,
+        help='Most users run with --target-p95'
+    )
+    parser.add_argument(
+        '--warm-up', type=phases.parse_warm_up, default=None,
+        help='Seconds of ramp-up before the steady state, or "auto" to '
+             'detect it. Requests are reported per ramp-up and steady-state '
+             'phase in [CSV_PREFIX]_phases.csv'
+    )
+    parser.add_argument(
+        '--warm-up-reset', action='store_true', default=False,
+        help='Reset the Locust stats when the steady state starts, so its '
+             'CSV files leave the ramp-up out'
+    )
+    parser.add_argument(
+        '--steady-window', type=float, default=phases.DEFAULT_STEADY_WINDOW,
+        help='Seconds the requests/s has to be stable for with --warm-up auto'
+    )
+    parser.add_argument(
+        '--steady-tolerance', type=float,
+        default=phases.DEFAULT_STEADY_TOLERANCE,
+        help='Largest coefficient of variation of the requests/s that is '
+             'stable with --warm-up auto'
+    )
+
+
+@events.init.add_listener
+def on_locust_init(environment, runner, **_kwargs):
+    """
+    Sets up the optional modes of the suite selected on the command line
+    """
+
+    options = environment.parsed_options
+    if options is None:
+        return
+    failures.start_failure_tracking(environment, runner, options)
+    if options.metrics_port is not None:
+        metrics.start_metrics_exporter(environment, runner, options)
+    if options.target_p95 is not None:
+        controller.start_adaptive_users(environment, runner, options)
+    if options.warm_up is not None:
+        phases.start_phase_tracking(environment, runner, options)
+    if options.image_index:
+        DogAPIUser.image_index = \
+            image_index.ImageIndex.load(options.image_index)
+    if options.soak:
+        DogAPIUser.request_names = \
+            soak.start_soak_mode(environment, runner, options)
+    if options.schedule:
+        try:
+            DogAPIReplayUser.schedule = schedule.Schedule(options.schedule)
+        except (OSError, ValueError) as exc:
+            # exit before any users start, rather than replaying nothing
+            sys.exit(f'Cannot replay --schedule {options.schedule}: {exc}')
+        DogAPIReplayUser.user_ids = \
+            itertools.count(options.schedule_first_user)
+        if DogAPIUser.request_names is not None:
+            DogAPIReplayUser.schedule.set_request_names(
+                DogAPIUser.request_names
+            )
+        environment.user_classes = [DogAPIReplayUser]
@@ -10,10 +10,10 @@ from selenium.webdriver import Firefox
 from selenium.webdriver.firefox.options import Options
 #from selenium.webdriver import Chrome
 #from selenium.webdriver.chrome.options import Options
-#from selenium.webdriver.common.by import By
-#from selenium.webdriver.support.ui import WebDriverWait
-#from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.common.by import By
+import utils.image_index as image_index
 import utils.utils as utils
+from utils.waits import Waiter
 
 class TestSuiteDogAPIWebSelenium(unittest.TestCase):
     """
@@ -50,8 +50,8 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
         #)
         self.browser = Firefox(options=opts) # if webdrvr executable in PATH
         # DEBUG, no headless
-        self.browser.implicitly_wait(5)
-        #self.timeout = 10
+        # explicit, condition based waits rather than implicitly_wait()
+        self.wait = Waiter(self.browser)
 
     def tearDown(self):
         """
@@ -59,6 +59,13 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
         failure. Provides required test case cleanup/teardown.
         """
 
+        # report which waits dominated the test case run time
+        for wait_name, count, total, longest, timeouts in \
+                self.wait.summary():
+            self.logger.info(
+                '%s: %s wait(s) %.3fs total %.3fs max %s timeout(s)',
+                wait_name, count, total, longest, timeouts
+            )
         # tear down test case and logger
         self.browser.quit()
         self.handler.close()
@@ -73,7 +80,7 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
 
         link_text = 'Documentation'
         self.browser.get(self.home_page_https)
-        doc_elem = self.browser.find_element_by_link_text(link_text)
+        doc_elem = self.wait.for_element(By.LINK_TEXT, link_text)
         self.assertIsNotNone(doc_elem)
         self.assertEqual(doc_elem.text, link_text)
         doc_elem.click()
@@ -100,8 +107,9 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
             'https://dog.ceo/dog-api/breeds-list'
         ]
         self._go_to_documentation_page_from_home_page()
-        ep_doc_lst = self.browser.find_elements_by_xpath(
-            '//ul[@class="endpoints-list"]/li/a'
+        ep_doc_lst = self.wait.for_elements(
+            By.XPATH, '//ul[@class="endpoints-list"]/li/a',
+            min_count=len(expect_ep_lnks_lst)
         )
         self.assertIsNotNone(ep_doc_lst)
         ep_doc_lnks = [elem.get_attribute('href') for elem in ep_doc_lst]
@@ -130,9 +138,7 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
             f'{self.home_page_https.replace("dog-api", "api")}/'\
             f'{expect_ep.lstrip("/").rstrip("/")}'
         self.browser.get(url)
-        ep_elem = self.browser.find_element_by_xpath(
-            '//span[@class="code"]'
-        )
+        ep_elem = self.wait.for_element(By.XPATH, '//span[@class="code"]')
         self.assertIsNotNone(ep_elem)
         self.assertIsNotNone(ep_elem.text)
         self.assertEqual(ep_elem.text, expect_home_page)
@@ -176,25 +182,24 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
 
         self.browser.get(self.home_page_https)
         main_url = self.browser.current_url
-        signup_element = self.browser.find_element_by_id('mce-EMAIL')
+        signup_element = self.wait.for_element(By.ID, 'mce-EMAIL')
         self.assertIsNotNone(signup_element)
-        join_button = self.browser.find_element_by_id(
-            'mc-embedded-subscribe'
-        )
+        join_button = self.wait.for_element(By.ID, 'mc-embedded-subscribe')
         self.assertIsNotNone(join_button)
         self.assertEqual(len(self.browser.window_handles), 1)
         main_window = self.browser.current_window_handle
         signup_element.send_keys(email_val)
         join_button.click()
-        self.assertEqual(len(self.browser.window_handles), 2)
-        other_window = self.browser.window_handles[-1]
+        window_handles = self.wait.for_window_count_change(1)
+        self.assertEqual(len(window_handles), 2)
+        other_window = window_handles[-1]
         self.browser.switch_to.window(other_window)
-        err_feedbck = self.browser.find_element_by_xpath(
-            '//div[@class="feedback error"]'
+        err_feedbck = self.wait.for_element(
+            By.XPATH, '//div[@class="feedback error"]'
         )
         self.assertIsNotNone(err_feedbck)
-        err_text = err_feedbck.find_element_by_xpath(
-            '//div[@class="errorText"]'
+        err_text = self.wait.for_element(
+            By.XPATH, '//div[@class="errorText"]', parent=err_feedbck
         ).text
         self.assertEqual(err_text, expect_err_msg)
         self.browser.switch_to.window(main_window)
@@ -215,12 +220,8 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
         """
 
         self.browser.get(page_url)
-        self.browser.find_element_by_id('rawdata-tab').click()
-        raw_data = self.browser.find_element_by_xpath(
-            '//pre[@class="data"]'
-        ).text
-        self.assertIsNotNone(raw_data)
-        json_data = json.loads(raw_data)
+        self.wait.for_element(By.ID, 'rawdata-tab').click()
+        json_data = self.wait.for_json_text(By.XPATH, '//pre[@class="data"]')
         self.assertIsNotNone(json_data)
         self.assertTrue('message' in json_data.keys())
         self.assertTrue('status' in json_data.keys())
@@ -311,19 +312,21 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
         self.browser.get(self.home_page_https)
         # first line contains JSON\n title so need to strip it from string
         # before json loads
-        img_element = self.browser.find_element_by_class_name('json')
-        self.assertIsNotNone(img_element)
-        current_displayed_image = json.loads(img_element.text.strip('JSON\n'))
+        current_displayed_image = self.wait.for_json_text(
+            By.CLASS_NAME, 'json', strip_chars='JSON\n'
+        )
         self.assertTrue('message' in current_displayed_image.keys())
         self.assertTrue('status' in current_displayed_image.keys())
         self.assertEqual(current_displayed_image['status'], 'success')
-        button_element = self.browser.find_element_by_xpath(
-            '//a[@class="get-dog button"]'
+        button_element = self.wait.for_element(
+            By.XPATH, '//a[@class="get-dog button"]'
         )
         self.assertIsNotNone(button_element)
         button_element.click()
-        img_element = self.browser.find_element_by_class_name('json')
-        fetched_new_image = json.loads(img_element.text.strip('JSON\n'))
+        fetched_new_image = self.wait.for_json_text(
+            By.CLASS_NAME, 'json', strip_chars='JSON\n',
+            old_data=current_displayed_image
+        )
         self.assertTrue('message' in current_displayed_image.keys())
         self.assertTrue('status' in current_displayed_image.keys())
         self.assertEqual(current_displayed_image['status'], 'success')
@@ -392,22 +395,22 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
         # title page
         page_title = self.browser.title
         self.assertEqual(page_title, expect_text)
-        meta_title = self.browser.find_element_by_xpath(
-            '//meta[@property="og:title"]'
+        meta_title = self.wait.for_element(
+            By.XPATH, '//meta[@property="og:title"]'
         )
         self.assertIsNotNone(meta_title)
         self.assertEqual(meta_title.get_attribute('content'), expect_text)
         self.assertEqual(meta_title.get_attribute('content'), page_title)
-        meta_url = self.browser.find_element_by_xpath(
-            '//meta[@property="og:url"]'
+        meta_url = self.wait.for_element(
+            By.XPATH, '//meta[@property="og:url"]'
         )
         self.assertIsNotNone(meta_url)
         self.assertEqual(
             meta_url.get_attribute('content'), self.home_page_https
         )
         # meta description
-        meta_desc = self.browser.find_element_by_xpath(
-            '//meta[@name="description"]'
+        meta_desc = self.wait.for_element(
+            By.XPATH, '//meta[@name="description"]'
         )
         self.assertIsNotNone(meta_desc)
         self.assertTrue(expect_text in meta_desc.get_attribute('content'))
@@ -430,26 +433,26 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
         """
 
         self.browser.get(self._get_ep_links_from_documentation_page()[-1])
-        img_element = self.browser.find_element_by_xpath(
-            '//div[@class="demo-image"]'
-        )
-        self.assertIsNotNone(img_element)
-        src_imgs = img_element.find_elements_by_tag_name('img')
+        demo_img_xpath = '//div[@class="demo-image"]/img'
+        src_imgs = self.wait.for_elements(By.XPATH, demo_img_xpath)
         self.assertIsNotNone(src_imgs)
         self.assertEqual(len(src_imgs), 1)
         src_img_value = src_imgs[0].get_attribute('src')
-        select_element = self.browser.find_element_by_xpath(
-            '//select[@class="dog-selector"]'
+        all_options = self.wait.for_elements(
+            By.XPATH, '//select[@class="dog-selector"]/option', min_count=2
         )
-        self.assertIsNotNone(select_element)
-        all_options = select_element.find_elements_by_tag_name('option')
         self.assertIsNotNone(all_options)
         self.assertTrue(len(all_options) > 1)
-        random.choice(all_options).click()
-        src_imgs = img_element.find_elements_by_tag_name('img')
-        self.assertIsNotNone(src_imgs)
-        self.assertEqual(len(src_imgs), 1)
-        new_img_value = src_imgs[0].get_attribute('src')
+        # avoid picking the breed whose image is already displayed
+        random.choice(
+            [opt for opt in all_options if not opt.is_selected()]
+        ).click()
+        new_img_value = self.wait.for_attribute_change(
+            By.XPATH, demo_img_xpath, 'src', src_img_value
+        )
+        self.assertEqual(
+            len(self.browser.find_elements_by_xpath(demo_img_xpath)), 1
+        )
         self.assertNotEqual(src_img_value, new_img_value)
 
     def test_check_cookies_available_across_site(self):
@@ -506,7 +509,7 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
                 dct['domain'].lstrip('.') in self.home_page_https
             )
         # navigate to a new page
-        self.browser.find_element_by_link_text('Documentation').click()
+        self.wait.for_element(By.LINK_TEXT, 'Documentation').click()
         _, cf_uid_2, ganalytics_uid_2 = get_cookies()
         self.assertIsNotNone(cf_uid_2)
         self.assertIsNotNone(ganalytics_uid_2)
@@ -617,20 +620,24 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
          Test any /breed/images/random/{number} endpoint returns the list of
          images. Test uses a large number to begin with, but not all breeds
          would have such a large set of pictures, so the test validates list
-         length is such a case.
+         length against the number of images the breed has, and that every
+         image returned is one of the breed's images.
 
         Test Steps:
             1. Get all available /breed endpoints
             2. Get only /random endpoints from the list, removing
                "/breeds/image/random" collections endpoint which is capped at
                50 max
-            3. Perform a request toward the endpoint
-            4. Check the length of the returned image list is equal to the
-               requested number of random images
+            3. Refresh the breed's images in the image index
+            4. Perform a request toward the endpoint
+            5. Check the length of the returned image list is equal to the
+               requested number of random images, or all the breed's images
+            6. Check every returned image is one of the breed's images
 
         Expected Result:
             The /random/{number_of_imgs} endpoint returns the requested number
-            of images or the most it has available otherwise
+            of images or the most it has available otherwise, all of the
+            requested breed
         """
 
         # this could also be random.randint(1, 100)
@@ -644,17 +651,29 @@ class TestSuiteDogAPIWebSelenium(unittest.TestCase):
             if '/random' in ep and ep != \
                 'https://dog.ceo/api/breeds/image/random'
         ]
-        # not all breeds have large numbers of pictures
-        # solution is to get the available pictures list beforehand
-        # and assert json_data matches that list, using requests
+        # not all breeds have large numbers of pictures, the image index
+        # holds the available pictures of each breed, built with
+        # build_image_index.py and refreshed here for the chosen breed only
         random_ep = \
             f'{random.choice(api_ep_compiled_list)}/'\
             f'{str(number_of_random_imgs)}'
+        index = image_index.ImageIndex.load(image_index.DEFAULT_INDEX_PATH)
+        index.refresh_endpoints(
+            [f'{random_ep.split("/images")[0]}/images'], max_age=24 * 3600
+        )
+        number_of_random_imgs = min(
+            number_of_random_imgs, index.get_image_count(random_ep)
+        )
         json_response = self._do_request(random_ep)
-        if len(json_response['message']) != number_of_random_imgs:
-            number_of_random_imgs = len(json_response['message'])
+        self.assertEqual(len(json_response['message']), number_of_random_imgs)
+        self.assertEqual(
+            index.get_foreign_images(random_ep, json_response['message']), []
+        )
         json_data = self._get_raw_data_from_page(random_ep)
         self.assertEqual(len(json_data['message']), number_of_random_imgs)
+        self.assertEqual(
+            index.get_foreign_images(random_ep, json_data['message']), []
+        )
 
     def test_random_collection_max_50(self):
         """
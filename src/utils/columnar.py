@@ -0,0 +1,250 @@
+""" Typed, memory-mappable columnar copies of the Locust CSV results """
+
+import array
+import json
+import math
+import mmap
+import os
+import sys
+import zlib
+import utils.results as results
+
+MANIFEST = 'manifest.json'
+TABLES = ('stats', 'history', 'failures')
+# narrowest first, array typecodes and their value ranges
+INT_TYPECODES = [
+    ('b', -2 ** 7, 2 ** 7 - 1), ('h', -2 ** 15, 2 ** 15 - 1),
+    ('i', -2 ** 31, 2 ** 31 - 1), ('q', -2 ** 63, 2 ** 63 - 1)
+]
+FLOAT_TYPECODE = 'd'
+# dictionary codes of a string column
+CODE_TYPECODE = 'i'
+
+
+def _encode_column(values, is_text=False):
+    """
+    Picks the narrowest type that holds every value of a column and encodes
+    the column as an array. Integer columns with missing values, i.e. the
+    "N/A" percentiles of the history file, become float columns with NaN.
+    String columns are dictionary encoded.
+
+    :param values: The column values as read by results.read_locust_csv()
+    :type values: list
+    :param is_text: True to always dictionary encode the column
+    :type is_text: bool
+    :return: The array, the column description for the manifest and the
+             dictionary of a string column or None
+    :rtype: tuple
+    """
+
+    present = [value for value in values if value is not None]
+    if is_text or any(isinstance(value, str) for value in present):
+        texts = ['' if value is None else str(value) for value in values]
+        dictionary = sorted(set(texts))
+        codes = {value: code for code, value in enumerate(dictionary)}
+        column = array.array(CODE_TYPECODE, [codes[text] for text in texts])
+        return column, {'type': 'str'}, dictionary
+
+    if len(present) == len(values) and \
+            all(isinstance(value, int) for value in present):
+        low, high = min(present, default=0), max(present, default=0)
+        typecode = next(
+            code for code, min_val, max_val in INT_TYPECODES
+            if min_val <= low and high <= max_val
+        )
+        return array.array(typecode, values), {'type': 'int'}, None
+
+    return array.array(
+        FLOAT_TYPECODE,
+        [math.nan if value is None else float(value) for value in values]
+    ), {'type': 'float'}, None
+
+
+def export_run(run, out_dir):
+    """
+    Converts the stats, history and failures CSV files of a run into one
+    binary file per column plus a manifest describing the run and its
+    columns
+
+    :param run: The run prefix, i.e. results/ten_users_four_minutes
+    :type run: str
+    :param out_dir: The directory to write the run's columns to
+    :type out_dir: str
+    :return: The manifest written
+    :rtype: dict
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    run_files = results.get_run_files(run)
+    manifest = {
+        'run': os.path.basename(run),
+        'parameters': results.get_run_parameters(run),
+        'byteorder': sys.byteorder,
+        'tables': dict()
+    }
+    for table in TABLES:
+        path = run_files[table]
+        if path is None:
+            continue
+        header = results.read_csv_header(path)
+        rows = results.read_locust_csv(path)
+        columns = dict()
+        for idx, name in enumerate(header):
+            column, description, dictionary = _encode_column(
+                [row[name] for row in rows], name in results.TEXT_COLUMNS
+            )
+            description['file'] = f'{table}.{idx:02d}.bin'
+            description['typecode'] = column.typecode
+            if description['type'] == 'str':
+                # i.e. thousands of request names, kept out of the manifest
+                # and only read when the column is
+                description['dictionary'] = f'{table}.{idx:02d}.dict.z'
+                with open(os.path.join(out_dir, description['dictionary']),
+                          'wb') as dict_file:
+                    dict_file.write(zlib.compress(
+                        json.dumps(dictionary).encode('utf-8')
+                    ))
+            with open(os.path.join(out_dir, description['file']), 'wb') \
+                    as bin_file:
+                column.tofile(bin_file)
+            columns[name] = description
+        manifest['tables'][table] = {'rows': len(rows), 'columns': columns}
+        if table == 'history' and rows:
+            manifest['parameters']['measured_secs'] = \
+                rows[-1]['Timestamp'] - rows[0]['Timestamp']
+
+    with open(os.path.join(out_dir, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    return manifest
+
+
+class ColumnarRun:
+    """
+    Lazily loads the columns of an exported run. Only the columns asked for
+    are read, each by memory mapping its file.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The directory written by export_run()
+        :type path: str
+        """
+
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        self.mapped = dict()
+
+    @property
+    def parameters(self):
+        """
+        :return: The run's users, hatch_rate, run_time_secs and measured_secs
+        :rtype: dict
+        """
+
+        return self.manifest['parameters']
+
+    def column_names(self, table):
+        """
+        :param table: One of TABLES
+        :type table: str
+        :return: The column names of the table, empty if it was not exported
+        :rtype: list
+        """
+
+        return list(
+            self.manifest['tables'].get(table, {}).get('columns', {})
+        )
+
+    def column(self, table, name):
+        """
+        Loads one column. Numeric columns are returned as a memoryview over
+        the memory mapped file, string columns are decoded to a list using
+        their compressed dictionary.
+
+        :param table: One of TABLES
+        :type table: str
+        :param name: The column name, i.e. '95%'
+        :type name: str
+        :return: The column values
+        :rtype: memoryview or list
+        """
+
+        description = self.manifest['tables'][table]['columns'][name]
+        path = os.path.join(self.path, description['file'])
+        typecode = description['typecode']
+        if self.manifest['byteorder'] != sys.byteorder:
+            # not mappable as is, read and swap into native order
+            values = array.array(typecode)
+            with open(path, 'rb') as bin_file:
+                values.frombytes(bin_file.read())
+            values.byteswap()
+            values = memoryview(values)
+        elif not os.path.getsize(path):
+            values = memoryview(array.array(typecode))
+        else:
+            if path not in self.mapped:
+                with open(path, 'rb') as bin_file:
+                    self.mapped[path] = mmap.mmap(
+                        bin_file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+            values = memoryview(self.mapped[path]).cast(typecode)
+
+        if description['type'] == 'str':
+            with open(os.path.join(self.path, description['dictionary']),
+                      'rb') as dict_file:
+                dictionary = json.loads(zlib.decompress(dict_file.read()))
+            return [dictionary[code] for code in values]
+
+        return values
+
+    def columns(self, table, names):
+        """
+        :param table: One of TABLES
+        :type table: str
+        :param names: The column names to load
+        :type names: list
+        :return: A dictionary of column name -> column values
+        :rtype: dict
+        """
+
+        return {name: self.column(table, name) for name in names}
+
+    def close(self):
+        """
+        Unmaps every column file mapped so far. A file still referenced by a
+        column returned before is unmapped once that column is released.
+        """
+
+        for mapped in self.mapped.values():
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self.mapped = dict()
+
+
+def query_runs(columnar_dir, table, names):
+    """
+    Loads the same columns from every run exported to a directory, i.e. to
+    compare the p95 of all runs
+
+    :param columnar_dir: The directory holding one exported run per
+                         subdirectory
+    :type columnar_dir: str
+    :param table: One of TABLES
+    :type table: str
+    :param names: The column names to load
+    :type names: list
+    :return: Yields (ColumnarRun, {column name: values}) per run
+    :rtype: generator
+    """
+
+    for entry in sorted(os.listdir(columnar_dir)):
+        path = os.path.join(columnar_dir, entry)
+        if not os.path.isfile(os.path.join(path, MANIFEST)):
+            continue
+        run = ColumnarRun(path)
+        if table in run.manifest['tables']:
+            yield run, run.columns(table, names)
@@ -0,0 +1,281 @@
+""" Adaptive user count for finding the sustainable throughput of the API """
+
+import csv
+import json
+import logging
+import time
+import gevent
+from locust.runners import STATE_CLEANUP, STATE_STOPPED, STATE_STOPPING, \
+    WorkerRunner
+from locust.stats import calculate_response_time_percentile
+
+TRACE_CSV_HEADER = [
+    'Timestamp', 'User Count', 'Requests/s', '95%', 'Error Rate',
+    'Action', 'Next User Count'
+]
+INCREASE = 'increase'
+DECREASE = 'decrease'
+HOLD = 'hold'
+
+logger = logging.getLogger(__name__)
+
+
+def get_stats_snapshot(entry):
+    """
+    :param entry: A Locust stats entry, i.e. environment.stats.total
+    :type entry: locust.stats.StatsEntry
+    :return: The entry's requests, failures and response times so far
+    :rtype: tuple
+    """
+
+    return entry.num_requests, entry.num_failures, dict(entry.response_times)
+
+
+def get_interval_stats(previous, current, interval_secs):
+    """
+    :param previous: The snapshot at the start of the interval, as returned
+                     by get_stats_snapshot()
+    :type previous: tuple
+    :param current: The snapshot at the end of the interval
+    :type current: tuple
+    :param interval_secs: The length of the interval in seconds
+    :type interval_secs: float
+    :return: The requests/s, 95th percentile response time and error rate
+             of the requests made in the interval, None if there were none
+    :rtype: tuple
+    """
+
+    prev_requests, prev_failures, prev_times = previous
+    requests, failures, response_times = current
+    if requests < prev_requests:
+        # the stats were reset during the interval
+        prev_requests, prev_failures, prev_times = 0, 0, dict()
+    count = requests - prev_requests
+    if count <= 0:
+        return None
+    interval_times = {
+        resp_time: num - prev_times.get(resp_time, 0)
+        for resp_time, num in response_times.items()
+        if num > prev_times.get(resp_time, 0)
+    }
+
+    return (
+        count / interval_secs,
+        calculate_response_time_percentile(interval_times, count, 0.95),
+        (failures - prev_failures) / count
+    )
+
+
+class AIMDController:
+    """
+    Additive increase, multiplicative decrease of the user count: users are
+    added a step at a time while the p95 and error rate of the last interval
+    are within their targets, and cut by a factor as soon as they are not.
+    The user count ends up oscillating just under the most the API sustains.
+    """
+
+    def __init__(self, target_p95, max_error_rate, step, backoff,
+                 max_users):
+        """
+        :param target_p95: The 95th percentile response time to stay under,
+                           in milliseconds
+        :type target_p95: float
+        :param max_error_rate: The failure ratio to stay under, i.e. 0.01
+        :type max_error_rate: float
+        :param step: The users added after a healthy interval
+        :type step: int
+        :param backoff: The factor the users are cut by after an unhealthy
+                        interval, i.e. 0.75
+        :type backoff: float
+        :param max_users: The most users ever run
+        :type max_users: int
+        """
+
+        self.target_p95 = target_p95
+        self.max_error_rate = max_error_rate
+        self.step = step
+        self.backoff = backoff
+        self.max_users = max_users
+
+    def is_healthy(self, p95, error_rate):
+        """
+        :param p95: The 95th percentile response time in milliseconds
+        :type p95: float
+        :param error_rate: The failure ratio
+        :type error_rate: float
+        :return: True if both are within their targets
+        :rtype: bool
+        """
+
+        return p95 <= self.target_p95 and error_rate <= self.max_error_rate
+
+    def next_users(self, users, interval):
+        """
+        :param users: The user count during the interval
+        :type users: int
+        :param interval: The interval's stats as returned by
+                         get_interval_stats(), None if it had no requests
+        :type interval: tuple
+        :return: The user count for the next interval and the action taken
+        :rtype: tuple
+        """
+
+        if interval is None:
+            return users, HOLD
+        _, p95, error_rate = interval
+        if not self.is_healthy(p95, error_rate):
+            return max(1, int(users * self.backoff)), DECREASE
+        if users >= self.max_users:
+            return users, HOLD
+
+        return min(self.max_users, users + self.step), INCREASE
+
+
+class ControlTrace:
+    """
+    Every control interval with the user count run, its stats and the
+    controller's action, kept in memory as the run has one row per interval
+    """
+
+    def __init__(self, controller):
+        """
+        :param controller: The controller the trace is of
+        :type controller: AIMDController
+        """
+
+        self.controller = controller
+        self.rows = list()
+
+    def add(self, timestamp, users, interval, action, next_users):
+        """
+        :param timestamp: The end of the interval
+        :type timestamp: float
+        :param users: The user count during the interval
+        :type users: int
+        :param interval: The interval's stats as returned by
+                         get_interval_stats(), None if it had no requests
+        :type interval: tuple
+        :param action: The action the controller took
+        :type action: str
+        :param next_users: The user count for the next interval
+        :type next_users: int
+        """
+
+        rps, p95, error_rate = interval if interval else (0.0, None, None)
+        self.rows.append(
+            [int(timestamp), users, round(rps, 2), p95,
+             None if error_rate is None else round(error_rate, 4), action,
+             next_users]
+        )
+
+    def get_operating_point(self):
+        """
+        The healthy interval with the highest throughput, converged once the
+        controller has had to back off at least once, as until then the
+        limit of the API was not reached
+
+        :return: The operating point
+        :rtype: dict
+        """
+
+        healthy = [
+            row for row in self.rows
+            if row[3] is not None and
+            self.controller.is_healthy(row[3], row[4])
+        ]
+        point = {
+            'converged': any(row[5] == DECREASE for row in self.rows),
+            'target_p95': self.controller.target_p95,
+            'max_error_rate': self.controller.max_error_rate,
+            'intervals': len(self.rows)
+        }
+        if healthy:
+            best = max(healthy, key=lambda row: row[2])
+            point.update(
+                timestamp=best[0], users=best[1], requests_per_sec=best[2],
+                p95=best[3], error_rate=best[4]
+            )
+
+        return point
+
+    def write(self, trace_path, point_path):
+        """
+        :param trace_path: The CSV file to write the trace to
+        :type trace_path: str
+        :param point_path: The JSON file to write the operating point to
+        :type point_path: str
+        """
+
+        with open(trace_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(TRACE_CSV_HEADER)
+            writer.writerows(self.rows)
+        with open(point_path, 'w') as json_file:
+            json.dump(self.get_operating_point(), json_file, indent=2)
+
+
+def start_adaptive_users(environment, runner, options):
+    """
+    Adjusts the user count every --control-interval seconds with an
+    AIMDController once the test starts, and writes the control trace to
+    [CSV_PREFIX]_control_trace.csv and the operating point found to
+    [CSV_PREFIX]_operating_point.json when Locust quits. Runs on the master
+    or a local runner, from the aggregated stats.
+
+    :param environment: The Locust environment
+    :type environment: locust.env.Environment
+    :param runner: The Locust runner
+    :type runner: locust.runners.Runner
+    :param options: The parsed command line options
+    :type options: argparse.Namespace
+    """
+
+    if isinstance(runner, WorkerRunner):
+        return
+
+    controller = AIMDController(
+        options.target_p95, options.max_error_rate, options.adaptive_step,
+        options.adaptive_backoff, options.max_users
+    )
+    trace = ControlTrace(controller)
+    prefix = f'{options.csv_prefix}_' if options.csv_prefix else ''
+    events = environment.events
+    control_loops = list()
+
+    def control_loop():
+        users = runner.target_user_count or 1
+        previous = get_stats_snapshot(environment.stats.total)
+        started = time.time()
+        while True:
+            gevent.sleep(options.control_interval)
+            if runner.state in (STATE_STOPPING, STATE_STOPPED,
+                                STATE_CLEANUP):
+                return
+            now = time.time()
+            current = get_stats_snapshot(environment.stats.total)
+            interval = get_interval_stats(previous, current, now - started)
+            previous, started = current, now
+            next_users, action = controller.next_users(users, interval)
+            trace.add(now, users, interval, action, next_users)
+            if next_users != users:
+                logger.info('Adaptive users: %s -> %s (%s)',
+                            users, next_users, action)
+                # the rate the test was started with, --hatch-rate is None
+                # when it was started from the web UI
+                runner.start(next_users, runner.hatch_rate)
+                users = next_users
+
+    def on_test_start(**_kwargs):
+        if not control_loops:
+            control_loops.append(gevent.spawn(control_loop))
+
+    def on_quitting(**_kwargs):
+        if not trace.rows:
+            return
+        trace.write(f'{prefix}control_trace.csv',
+                    f'{prefix}operating_point.json')
+        logger.info('Adaptive users operating point: %s',
+                    trace.get_operating_point())
+
+    events.test_start.add_listener(on_test_start)
+    events.quitting.add_listener(on_quitting)
@@ -0,0 +1,231 @@
+""" Failure clustering and per route error budgets for the Locust suite """
+
+import csv
+import logging
+import time
+import gevent
+from locust.runners import MasterRunner, WorkerRunner
+import utils.utils as utils
+
+CLUSTERS_CSV_HEADER = [
+    'Window Start', 'Route', 'Error', 'Occurrences', 'First Seen',
+    'Last Seen', 'Example'
+]
+
+logger = logging.getLogger(__name__)
+
+
+def get_error_kind(exception):
+    """
+    Reduces a request failure to what it has in common with failures of the
+    same cause, i.e. "HTTP 503" rather than the message holding the url
+
+    :param exception: The exception the request failed with
+    :type exception: Exception
+    :return: The error kind, i.e. "HTTP 503" or "ConnectionError"
+    :rtype: str
+    """
+
+    response = getattr(exception, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    if status_code is not None:
+        return f'HTTP {status_code}'
+
+    return type(exception).__name__
+
+
+class FailureClusters:
+    """
+    Groups request failures by route template, error kind and time window,
+    so one incident hitting hundreds of /random/{n} urls is counted as a
+    handful of clusters.
+
+    Clusters are kept as (window start, route, error kind) ->
+    [occurrences, first seen, last seen, example message].
+    """
+
+    def __init__(self, window_secs):
+        """
+        :param window_secs: The length of a clustering window in seconds
+        :type window_secs: int
+        """
+
+        self.window_secs = window_secs
+        self.clusters = dict()
+
+    def record(self, name, exception, timestamp):
+        """
+        :param name: The request name or url
+        :type name: str
+        :param exception: The exception the request failed with
+        :type exception: Exception
+        :param timestamp: The time of the failure
+        :type timestamp: float
+        """
+
+        key = (
+            int(timestamp // self.window_secs * self.window_secs),
+            utils.get_route_template(name), get_error_kind(exception)
+        )
+        cluster = self.clusters.get(key)
+        if cluster is None:
+            self.clusters[key] = [1, timestamp, timestamp, str(exception)]
+            return
+        cluster[0] += 1
+        cluster[2] = max(cluster[2], timestamp)
+
+    def drain(self):
+        """
+        Hands over the clusters recorded so far, i.e. for a worker to send to
+        the master, as a list that survives serialisation
+
+        :return: A list of [window start, route, error kind, occurrences,
+                 first seen, last seen, example] lists
+        :rtype: list
+        """
+
+        clusters, self.clusters = self.clusters, dict()
+
+        return [list(key) + cluster for key, cluster in clusters.items()]
+
+    def merge(self, drained):
+        """
+        :param drained: The clusters returned by drain()
+        :type drained: list
+        """
+
+        for window, route, kind, count, first, last, example in drained:
+            cluster = self.clusters.get((window, route, kind))
+            if cluster is None:
+                self.clusters[(window, route, kind)] = \
+                    [count, first, last, example]
+                continue
+            cluster[0] += count
+            cluster[1] = min(cluster[1], first)
+            cluster[2] = max(cluster[2], last)
+
+    def write_csv(self, path):
+        """
+        :param path: The CSV file to write the clusters to
+        :type path: str
+        """
+
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(CLUSTERS_CSV_HEADER)
+            for key in sorted(self.clusters):
+                count, first, last, example = self.clusters[key]
+                writer.writerow(
+                    list(key) + [count, int(first), int(last), example]
+                )
+
+
+def get_route_counts(stats):
+    """
+    Totals the requests and failures of the Locust stats per route template
+
+    :param stats: The Locust RequestStats instance, i.e. environment.stats
+    :type stats: locust.stats.RequestStats
+    :return: A dictionary of route -> [requests, failures]
+    :rtype: dict
+    """
+
+    routes = dict()
+    for entry in stats.entries.values():
+        counts = routes.setdefault(
+            utils.get_route_template(entry.name), [0, 0]
+        )
+        counts[0] += entry.num_requests
+        counts[1] += entry.num_failures
+
+    return routes
+
+
+def get_exhausted_routes(route_counts, budget, min_requests):
+    """
+    :param route_counts: The counts returned by get_route_counts()
+    :type route_counts: dict
+    :param budget: The allowed failure ratio of a route, i.e. 0.01
+    :type budget: float
+    :param min_requests: Routes with fewer requests are not checked, so an
+                         early failure does not exhaust the budget
+    :type min_requests: int
+    :return: The routes that failed more than the budget allows, as
+             (route, requests, failures) tuples
+    :rtype: list
+    """
+
+    return [
+        (route, requests, failures)
+        for route, (requests, failures) in sorted(route_counts.items())
+        if requests >= min_requests and failures > budget * requests
+    ]
+
+
+def start_failure_tracking(environment, runner, options):
+    """
+    Clusters request failures, writing them to
+    [CSV_PREFIX]_failure_clusters.csv when Locust quits, and stops the run
+    with exit code 1 once a route has used up its --error-budget. Workers
+    send their clusters to the master with every report, the budget is
+    checked on the master or local runner from the aggregated stats.
+
+    :param environment: The Locust environment
+    :type environment: locust.env.Environment
+    :param runner: The Locust runner
+    :type runner: locust.runners.Runner
+    :param options: The parsed command line options
+    :type options: argparse.Namespace
+    """
+
+    clusters = FailureClusters(options.failure_window)
+    events = environment.events
+
+    if not isinstance(runner, MasterRunner):
+        def on_request_failure(name, exception, **_kwargs):
+            clusters.record(name, exception, time.time())
+
+        events.request_failure.add_listener(on_request_failure)
+
+    if isinstance(runner, WorkerRunner):
+        def on_report_to_master(data, **_kwargs):
+            data['failure_clusters'] = clusters.drain()
+
+        events.report_to_master.add_listener(on_report_to_master)
+        return
+
+    def on_worker_report(data, **_kwargs):
+        clusters.merge(data.get('failure_clusters', []))
+
+    def on_quitting(**_kwargs):
+        if not clusters.clusters:
+            return
+        for key in sorted(clusters.clusters,
+                          key=lambda k: -clusters.clusters[k][0])[:10]:
+            logger.info('Failure cluster %s: %s occurrences',
+                        key, clusters.clusters[key][0])
+        if options.csv_prefix:
+            clusters.write_csv(f'{options.csv_prefix}_failure_clusters.csv')
+
+    def error_budget_loop():
+        while True:
+            gevent.sleep(1)
+            exhausted = get_exhausted_routes(
+                get_route_counts(environment.stats), options.error_budget,
+                options.error_budget_min_requests
+            )
+            if exhausted:
+                for route, requests, failures in exhausted:
+                    logger.error(
+                        'Error budget of %s exhausted for %s: %s of %s '
+                        'requests failed, stopping the run',
+                        options.error_budget, route, failures, requests
+                    )
+                environment.process_exit_code = 1
+                runner.quit()
+                return
+
+    events.worker_report.add_listener(on_worker_report)
+    events.quitting.add_listener(on_quitting)
+    if options.error_budget is not None:
+        gevent.spawn(error_budget_loop)
@@ -0,0 +1,262 @@
+""" Persistent index of every breed's images, for validating /random """
+
+import array
+import hashlib
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import utils.utils as utils
+
+MAGIC = b'DOGIMGX1'
+# magic, length of the JSON metadata that follows
+HEADER = struct.Struct('<8sI')
+HASH_TYPECODE = 'Q'
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_INDEX_PATH = os.path.join('results', 'image_index.bin')
+
+
+def hash_image_url(image_url):
+    """
+    :param image_url: The image url, i.e. https://images.dog.ceo/breeds/
+                      hound-afghan/n02088094_1003.jpg
+    :type image_url: str
+    :return: A 64 bit hash of the url, kept instead of the url itself
+    :rtype: int
+    """
+
+    return int.from_bytes(
+        hashlib.blake2b(image_url.encode('utf-8'), digest_size=8).digest(),
+        'little'
+    )
+
+
+def get_breed_key(endpoint):
+    """
+    Given any breed or sub-breed endpoint, i.e.
+    https://dog.ceo/api/breed/hound/afghan/images/random/3, returns the key
+    of the breed in the index, i.e. "hound/afghan"
+
+    :param endpoint: The endpoint url
+    :type endpoint: str
+    :return: The breed key, None if the endpoint is not a breed endpoint
+    :rtype: str
+    """
+
+    segments = endpoint.split('/breed/', 1)
+    if len(segments) < 2:
+        return None
+
+    return segments[1].split('/images', 1)[0].split('/list', 1)[0]
+
+
+class ImageIndex:
+    """
+    Maps breed keys to the set of hashes of every image url the breed's
+    /images endpoint lists. Saved to a single binary file: a header, JSON
+    metadata per breed, then each breed's sorted 64 bit hashes.
+    """
+
+    def __init__(self):
+        self.breeds = dict()
+        self.hashes = dict()
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: The file written by save(), if it does not exist an
+                     empty index is returned
+        :type path: str
+        :return: The loaded index
+        :rtype: ImageIndex
+        """
+
+        index = cls()
+        if not os.path.isfile(path):
+            return index
+        with open(path, 'rb') as index_file:
+            data = index_file.read()
+        magic, meta_len = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an image index')
+        index.breeds = json.loads(
+            data[HEADER.size:HEADER.size + meta_len].decode('utf-8')
+        )
+        offset = HEADER.size + meta_len
+        item_size = array.array(HASH_TYPECODE).itemsize
+        for breed_key in sorted(index.breeds):
+            count = index.breeds[breed_key]['count']
+            hashes = array.array(HASH_TYPECODE)
+            hashes.frombytes(data[offset:offset + count * item_size])
+            index.hashes[breed_key] = set(hashes)
+            offset += count * item_size
+
+        return index
+
+    def save(self, path):
+        """
+        :param path: The file to write the index to
+        :type path: str
+        """
+
+        meta = json.dumps(self.breeds, sort_keys=True).encode('utf-8')
+        with open(path + '.tmp', 'wb') as index_file:
+            index_file.write(HEADER.pack(MAGIC, len(meta)))
+            index_file.write(meta)
+            for breed_key in sorted(self.breeds):
+                array.array(
+                    HASH_TYPECODE, sorted(self.hashes[breed_key])
+                ).tofile(index_file)
+        os.replace(path + '.tmp', path)
+
+    def _fetch(self, images_ep, max_age):
+        """
+        Requests a breed's /images endpoint, conditionally on the ETag seen
+        the last time, unless it was fetched less than max_age seconds ago
+
+        :param images_ep: The breed's /images endpoint
+        :type images_ep: str
+        :param max_age: Seconds a breed is considered up to date for
+        :type max_age: float
+        :return: The breed key, its new metadata and image url hashes, or
+                 None for both if the breed is unchanged
+        :rtype: tuple
+        """
+
+        breed_key = get_breed_key(images_ep)
+        known = self.breeds.get(breed_key)
+        if known and time.time() - known['fetched'] < max_age:
+            return breed_key, None, None
+        headers = dict()
+        if known and known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        response = requests.get(images_ep, headers=headers)
+        if response.status_code == 304:
+            return breed_key, dict(known, fetched=time.time()), None
+        response.raise_for_status()
+        hashes = {
+            hash_image_url(image_url)
+            for image_url in json.loads(response.text)['message']
+        }
+
+        return breed_key, {
+            'count': len(hashes), 'fetched': time.time(),
+            'etag': response.headers.get('ETag')
+        }, hashes
+
+    def refresh(self, url, list_all_dict, max_age=0,
+                max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Concurrently fetches the /images endpoint of every breed and
+        sub-breed in list_all_dict, only replacing the breeds that changed.
+        Breeds no longer listed are dropped from the index.
+
+        :param url: The url to attach to the endpoints, i.e.
+                    https://dog.ceo/api
+        :type url: str
+        :param list_all_dict: A dictionary with all breeds retrieved from
+                              GET(https://dog.ceo/api/breeds/list/all)
+        :type list_all_dict: dict
+        :param max_age: Seconds a breed is considered up to date for, 0 to
+                        always check
+        :type max_age: float
+        :param max_workers: The number of concurrent requests
+        :type max_workers: int
+        :return: The number of breeds whose images changed
+        :rtype: int
+        """
+
+        images_eps = [
+            ep for ep in
+            utils.get_all_available_breed_endpoints_from_list_all(
+                url, list_all_dict
+            )
+            if ep.endswith('/images')
+        ]
+        listed = {get_breed_key(ep) for ep in images_eps}
+        for breed_key in set(self.breeds) - listed:
+            del self.breeds[breed_key]
+            del self.hashes[breed_key]
+
+        return self.refresh_endpoints(images_eps, max_age, max_workers)
+
+    def refresh_endpoints(self, images_eps, max_age=0,
+                          max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Concurrently fetches the given /images endpoints, only replacing the
+        breeds that changed
+
+        :param images_eps: The /images endpoints, i.e.
+                           https://dog.ceo/api/breed/hound/afghan/images
+        :type images_eps: list
+        :param max_age: Seconds a breed is considered up to date for, 0 to
+                        always check
+        :type max_age: float
+        :param max_workers: The number of concurrent requests
+        :type max_workers: int
+        :return: The number of breeds whose images changed
+        :rtype: int
+        """
+
+        changed = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for breed_key, meta, hashes in executor.map(
+                    lambda ep: self._fetch(ep, max_age), images_eps):
+                if meta is not None:
+                    self.breeds[breed_key] = meta
+                if hashes is not None:
+                    self.hashes[breed_key] = hashes
+                    changed += 1
+
+        return changed
+
+    def contains(self, breed_key, image_url):
+        """
+        :param breed_key: The breed key, i.e. "hound/afghan"
+        :type breed_key: str
+        :param image_url: The image url to look up
+        :type image_url: str
+        :return: True if the image is one of the breed's images
+        :rtype: bool
+        """
+
+        return hash_image_url(image_url) in self.hashes.get(breed_key, ())
+
+    def get_image_count(self, endpoint):
+        """
+        :param endpoint: Any endpoint of the breed, i.e.
+                         https://dog.ceo/api/breed/hound/images/random/3
+        :type endpoint: str
+        :return: The number of images the breed has, None if not indexed
+        :rtype: int
+        """
+
+        meta = self.breeds.get(get_breed_key(endpoint))
+
+        return None if meta is None else meta['count']
+
+    def get_foreign_images(self, endpoint, image_urls):
+        """
+        :param endpoint: The endpoint the images were returned by, i.e.
+                         https://dog.ceo/api/breed/hound/images/random/3
+        :type endpoint: str
+        :param image_urls: The image url, or list of image urls, returned
+        :type image_urls: str or list
+        :return: The image urls that are not images of the endpoint's breed,
+                 empty if the breed is not indexed, i.e. it was added to the
+                 API after the index was built, as they cannot be verified
+        :rtype: list
+        """
+
+        if isinstance(image_urls, str):
+            image_urls = [image_urls]
+        breed_hashes = self.hashes.get(get_breed_key(endpoint))
+        if breed_hashes is None:
+            return []
+
+        return [
+            image_url for image_url in image_urls
+            if hash_image_url(image_url) not in breed_hashes
+        ]
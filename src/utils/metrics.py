@@ -0,0 +1,296 @@
+""" Live Prometheus metrics of a running Locust load test """
+
+import bisect
+import logging
+from gevent.pywsgi import WSGIServer
+from locust.runners import MasterRunner, WorkerRunner
+import utils.failures as failures
+import utils.utils as utils
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+
+def escape_label(value):
+    """
+    :param value: A label value
+    :type value: str
+    :return: The value escaped for the Prometheus text format
+    :rtype: str
+    """
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def format_labels(**labels):
+    """
+    :return: The labels as {name="value",...}, in the order given
+    :rtype: str
+    """
+
+    return '{' + ','.join(
+        f'{name}="{escape_label(value)}"' for name, value in labels.items()
+    ) + '}'
+
+
+class RequestMetrics:
+    """
+    Per route request counters, latency histograms and failure counters.
+    Recording a request is a dictionary lookup and a few increments, no
+    locks are taken: the request hooks and the scrapes all run in greenlets
+    of the same thread, which only switch on I/O.
+
+    A route is kept as [requests, total response time in milliseconds,
+    [requests per latency bucket, the last one for +Inf]], the buckets are
+    only made cumulative when rendered.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        :param buckets: The upper bounds of the latency buckets in seconds
+        :type buckets: tuple
+        """
+
+        self.buckets = buckets
+        self.bounds_ms = [bound * 1000 for bound in buckets]
+        # (method, route) -> route counters, see the class docstring
+        self.routes = dict()
+        # (method, route, error kind) -> failures
+        self.failures = dict()
+        # (method, request name) -> route counters, so a request name is
+        # only turned into its route template once
+        self.names = dict()
+
+    def _get_route(self, method, name):
+        """
+        :param method: The request method, i.e. GET
+        :type method: str
+        :param name: The request name or url
+        :type name: str
+        :return: The counters of the request's route
+        :rtype: list
+        """
+
+        route = self.names.get((method, name))
+        if route is None:
+            key = (method, utils.get_route_template(name))
+            route = self.routes.get(key)
+            if route is None:
+                route = self.routes[key] = \
+                    [0, 0.0, [0] * (len(self.bounds_ms) + 1)]
+            self.names[(method, name)] = route
+
+        return route
+
+    def record(self, method, name, response_time):
+        """
+        :param method: The request method, i.e. GET
+        :type method: str
+        :param name: The request name or url
+        :type name: str
+        :param response_time: The response time in milliseconds
+        :type response_time: float
+        """
+
+        route = self._get_route(method, name)
+        route[0] += 1
+        route[1] += response_time
+        route[2][bisect.bisect_left(self.bounds_ms, response_time)] += 1
+
+    def record_failure(self, method, name, response_time, exception):
+        """
+        Records a failed request, which is also counted in the request
+        counters and latency histogram
+
+        :param method: The request method, i.e. GET
+        :type method: str
+        :param name: The request name or url
+        :type name: str
+        :param response_time: The response time in milliseconds
+        :type response_time: float
+        :param exception: The exception the request failed with
+        :type exception: Exception
+        """
+
+        self.record(method, name, response_time)
+        key = (
+            method, utils.get_route_template(name),
+            failures.get_error_kind(exception)
+        )
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def drain(self):
+        """
+        Hands over the counts recorded so far, i.e. for a worker to send to
+        the master, as lists that survive serialisation, and starts over
+
+        :return: The routes as [method, route, requests, total response
+                 time, buckets] lists and the failures as [method, route,
+                 error kind, failures] lists
+        :rtype: tuple
+        """
+
+        routes, self.routes = self.routes, dict()
+        failed, self.failures = self.failures, dict()
+        self.names = dict()
+
+        return (
+            [list(key) + route for key, route in routes.items()],
+            [list(key) + [count] for key, count in failed.items()]
+        )
+
+    def merge(self, drained):
+        """
+        :param drained: The counts returned by drain()
+        :type drained: tuple
+        """
+
+        routes, failed = drained
+        for method, route_name, count, total, buckets in routes:
+            route = self.routes.get((method, route_name))
+            if route is None:
+                route = self.routes[(method, route_name)] = \
+                    [0, 0.0, [0] * len(buckets)]
+            route[0] += count
+            route[1] += total
+            for idx, bucket_count in enumerate(buckets):
+                route[2][idx] += bucket_count
+        for method, route_name, kind, count in failed:
+            key = (method, route_name, kind)
+            self.failures[key] = self.failures.get(key, 0) + count
+
+    def render(self, users=None):
+        """
+        :param users: The number of running users, left out if None
+        :type users: int
+        :return: The metrics in the Prometheus text exposition format
+        :rtype: str
+        """
+
+        lines = [
+            '# HELP locust_requests_total Requests completed, by route.',
+            '# TYPE locust_requests_total counter'
+        ]
+        routes = sorted(self.routes.items())
+        for (method, route_name), (count, _, _) in routes:
+            labels = format_labels(method=method, route=route_name)
+            lines.append(f'locust_requests_total{labels} {count}')
+
+        lines += [
+            '# HELP locust_request_duration_seconds Response times, by '
+            'route.',
+            '# TYPE locust_request_duration_seconds histogram'
+        ]
+        for (method, route_name), (count, total, buckets) in routes:
+            cumulative = 0
+            for bound, bucket_count in zip(
+                    [str(bound) for bound in self.buckets] + ['+Inf'],
+                    buckets):
+                cumulative += bucket_count
+                labels = format_labels(
+                    method=method, route=route_name, le=bound
+                )
+                lines.append(
+                    f'locust_request_duration_seconds_bucket{labels} '
+                    f'{cumulative}'
+                )
+            labels = format_labels(method=method, route=route_name)
+            lines.append(
+                f'locust_request_duration_seconds_sum{labels} {total / 1000}'
+            )
+            lines.append(
+                f'locust_request_duration_seconds_count{labels} {count}'
+            )
+
+        lines += [
+            '# HELP locust_request_failures_total Failed requests, by route '
+            'and error.',
+            '# TYPE locust_request_failures_total counter'
+        ]
+        for (method, route_name, kind), count in \
+                sorted(self.failures.items()):
+            labels = format_labels(method=method, route=route_name,
+                                   error=kind)
+            lines.append(f'locust_request_failures_total{labels} {count}')
+
+        if users is not None:
+            lines += [
+                '# HELP locust_users Running users.',
+                '# TYPE locust_users gauge',
+                f'locust_users {users}'
+            ]
+
+        return '\n'.join(lines) + '\n'
+
+
+def start_metrics_exporter(environment, runner, options):
+    """
+    Serves the request metrics of the run at
+    http://[--metrics-host]:[--metrics-port]/metrics while Locust runs.
+    Workers send their counts to the master with every report, so only the
+    master or a local runner serves the metrics.
+
+    :param environment: The Locust environment
+    :type environment: locust.env.Environment
+    :param runner: The Locust runner
+    :type runner: locust.runners.Runner
+    :param options: The parsed command line options
+    :type options: argparse.Namespace
+    """
+
+    metrics = RequestMetrics()
+    events = environment.events
+
+    if not isinstance(runner, MasterRunner):
+        def on_request_success(request_type, name, response_time,
+                               **_kwargs):
+            metrics.record(request_type, name, response_time)
+
+        def on_request_failure(request_type, name, response_time, exception,
+                               **_kwargs):
+            metrics.record_failure(request_type, name, response_time,
+                                   exception)
+
+        events.request_success.add_listener(on_request_success)
+        events.request_failure.add_listener(on_request_failure)
+
+    if isinstance(runner, WorkerRunner):
+        def on_report_to_master(data, **_kwargs):
+            data['metrics'] = metrics.drain()
+
+        events.report_to_master.add_listener(on_report_to_master)
+        return
+
+    def on_worker_report(data, **_kwargs):
+        if 'metrics' in data:
+            metrics.merge(data['metrics'])
+
+    def metrics_app(environ, start_response):
+        if environ['PATH_INFO'] != '/metrics':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found\n']
+        body = metrics.render(runner.user_count).encode('utf-8')
+        start_response('200 OK', [
+            ('Content-Type', CONTENT_TYPE),
+            ('Content-Length', str(len(body)))
+        ])
+        return [body]
+
+    server = WSGIServer(
+        (options.metrics_host, options.metrics_port), metrics_app, log=None
+    )
+
+    def on_quitting(**_kwargs):
+        server.stop(timeout=1)
+
+    events.worker_report.add_listener(on_worker_report)
+    events.quitting.add_listener(on_quitting)
+    server.start()
+    logger.info('Serving metrics at http://%s:%s/metrics',
+                options.metrics_host, options.metrics_port)
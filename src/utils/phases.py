@@ -0,0 +1,379 @@
+""" Ramp-up, steady-state and cool-down phases of a Locust run """
+
+import argparse
+import collections
+import csv
+import logging
+import statistics
+import time
+import gevent
+from locust.runners import STATE_RUNNING, MasterRunner, WorkerRunner
+import utils.results as results
+import utils.soak as soak
+
+RAMP_UP = 'ramp-up'
+STEADY_STATE = 'steady-state'
+COOL_DOWN = 'cool-down'
+PHASES = (RAMP_UP, STEADY_STATE, COOL_DOWN)
+DEFAULT_STEADY_WINDOW = 30
+DEFAULT_STEADY_TOLERANCE = 0.1
+PHASES_CSV_HEADER = [
+    'Phase', 'Start', 'End', 'Name', 'Request Count', 'Failure Count',
+    'Requests/s', 'Average Response Time', 'Min Response Time',
+    'Max Response Time', '50%', '90%', '95%', '99%', '100%'
+]
+
+logger = logging.getLogger(__name__)
+
+
+def parse_warm_up(value):
+    """
+    Command line type of --warm-up
+
+    :param value: "auto" or a number of seconds
+    :type value: str
+    :return: "auto" or the seconds
+    :rtype: str or float
+    """
+
+    if value == 'auto':
+        return value
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            f'expected "auto" or seconds, got {value!r}'
+        ) from exc
+
+
+class SteadyStateDetector:
+    """
+    Detects when a run settles: once all users are started, the requests/s
+    sampled over the last window_secs seconds have to vary by no more than
+    the tolerance, as a coefficient of variation. Connection setup and cold
+    caches show as a climbing requests/s and are kept out of the steady
+    state.
+    """
+
+    def __init__(self, window_secs=DEFAULT_STEADY_WINDOW,
+                 tolerance=DEFAULT_STEADY_TOLERANCE):
+        """
+        :param window_secs: The seconds the requests/s has to be stable for
+        :type window_secs: float
+        :param tolerance: The largest coefficient of variation of the
+                          requests/s that is still stable, i.e. 0.1
+        :type tolerance: float
+        """
+
+        self.window_secs = window_secs
+        self.tolerance = tolerance
+        self.samples = collections.deque()
+
+    def add(self, timestamp, rps, ramping=False):
+        """
+        :param timestamp: The time of the sample
+        :type timestamp: float
+        :param rps: The current requests/s
+        :type rps: float
+        :param ramping: True while users are still being started, the
+                        samples so far are dropped
+        :type ramping: bool
+        :return: True if the run is in a steady state
+        :rtype: bool
+        """
+
+        if ramping or rps is None:
+            self.samples.clear()
+            return False
+        self.samples.append((timestamp, rps))
+        # keep the newest sample from before the window, so the samples span
+        # the whole window whatever the sampling interval
+        while len(self.samples) > 1 and \
+                self.samples[1][0] <= timestamp - self.window_secs:
+            self.samples.popleft()
+        if timestamp - self.samples[0][0] < self.window_secs or \
+                len(self.samples) < 3:
+            return False
+        rates = [rate for _, rate in self.samples]
+        mean = statistics.mean(rates)
+
+        return mean > 0 and \
+            statistics.pstdev(rates) / mean <= self.tolerance
+
+
+def get_history_phases(history_rows, warm_up=None,
+                       window_secs=DEFAULT_STEADY_WINDOW,
+                       tolerance=DEFAULT_STEADY_TOLERANCE):
+    """
+    Splits the aggregated rows of a *_stats_history.csv file into phases.
+    The ramp-up lasts until the user count first stops rising and the
+    steady state is detected by a SteadyStateDetector, or for warm_up
+    seconds after the first row. The cool-down is the decline of the user
+    count the run ends with, i.e. its last row at 0 users, so user count
+    changes during the run, i.e. by --target-p95, stay in the steady state.
+
+    :param history_rows: Rows read with results.read_locust_csv()
+    :type history_rows: list
+    :param warm_up: Seconds to count as ramp-up instead of detecting the
+                    steady state
+    :type warm_up: float
+    :param window_secs: See SteadyStateDetector
+    :type window_secs: float
+    :param tolerance: See SteadyStateDetector
+    :type tolerance: float
+    :return: The aggregated rows of every phase, keyed by phase, the steady
+             state rows are empty if it was not reached
+    :rtype: dict
+    """
+
+    rows = [
+        row for row in history_rows if row['Name'] == results.AGGREGATED
+    ]
+    phases = {phase: list() for phase in PHASES}
+    if not rows:
+        return phases
+    users = [row['User Count'] or 0 for row in rows]
+    cool_down = len(rows)
+    while cool_down > 1 and users[cool_down - 1] < users[cool_down - 2]:
+        cool_down -= 1
+    detector = SteadyStateDetector(window_secs, tolerance)
+    phase = RAMP_UP
+    hatched = False
+    for idx, row in enumerate(rows):
+        if idx >= cool_down:
+            phase = COOL_DOWN
+        elif phase == RAMP_UP:
+            hatched = hatched or idx > 0 and users[idx] <= users[idx - 1]
+            if warm_up is not None:
+                steady = row['Timestamp'] - rows[0]['Timestamp'] >= warm_up
+            else:
+                steady = detector.add(
+                    row['Timestamp'], row['Requests/s'], ramping=not hatched
+                )
+            if steady:
+                phase = STEADY_STATE
+        phases[phase].append(row)
+
+    return phases
+
+
+def summarise_history_phase(previous_row, rows):
+    """
+    Summarises the aggregated history rows of a phase. Requests and
+    failures come from the running totals, the response times from the
+    percentiles of Locust's current response time window, as the history
+    holds no distributions.
+
+    :param previous_row: The row before the phase, None if it is the first
+    :type previous_row: dict
+    :param rows: The rows of the phase
+    :type rows: list
+    :return: The start, end, requests, failures, requests/s and the medians
+             of the 50% and 95% response times sampled, None if there are
+             no rows
+    :rtype: dict
+    """
+
+    if not rows:
+        return None
+    first = previous_row or rows[0]
+    requests = (rows[-1]['Total Request Count'] or 0) - \
+        ((first['Total Request Count'] or 0) if previous_row else 0)
+    failures = (rows[-1]['Total Failure Count'] or 0) - \
+        ((first['Total Failure Count'] or 0) if previous_row else 0)
+    secs = rows[-1]['Timestamp'] - first['Timestamp']
+
+    def median_of(column):
+        values = [row[column] for row in rows if row[column] is not None]
+        return statistics.median(values) if values else None
+
+    return {
+        'start': first['Timestamp'], 'end': rows[-1]['Timestamp'],
+        'requests': requests, 'failures': failures,
+        'requests_per_sec': requests / secs if secs > 0 else None,
+        '50%': median_of('50%'), '95%': median_of('95%')
+    }
+
+
+def summarise_history(history_rows, **kwargs):
+    """
+    :param history_rows: Rows read with results.read_locust_csv()
+    :type history_rows: list
+    :param kwargs: Passed on to get_history_phases()
+    :return: The summary of every phase, keyed by phase, see
+             summarise_history_phase()
+    :rtype: dict
+    """
+
+    phases = get_history_phases(history_rows, **kwargs)
+    summaries = dict()
+    previous_row = None
+    for phase in PHASES:
+        summaries[phase] = summarise_history_phase(
+            previous_row, phases[phase]
+        )
+        if phases[phase]:
+            previous_row = phases[phase][-1]
+
+    return summaries
+
+
+class PhaseStats:
+    """
+    The requests of a running test recorded per phase, written to
+    [CSV_PREFIX]_phases.csv when Locust quits
+    """
+
+    def __init__(self):
+        self.phase = RAMP_UP
+        self.counters = {RAMP_UP: soak.RouteCounters()}
+        self.times = {RAMP_UP: [time.time(), None]}
+
+    def enter(self, phase):
+        """
+        :param phase: The phase requests are recorded in from now on
+        :type phase: str
+        """
+
+        now = time.time()
+        self.times[self.phase][1] = now
+        self.phase = phase
+        self.counters[phase] = soak.RouteCounters()
+        self.times[phase] = [now, None]
+
+    def write_csv(self, path):
+        """
+        :param path: The CSV file to write the phases to
+        :type path: str
+        """
+
+        now = time.time()
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(PHASES_CSV_HEADER)
+            for phase in PHASES:
+                if phase not in self.counters:
+                    continue
+                start, end = self.times[phase]
+                end = end or now
+                for row in self.counters[phase].get_rows():
+                    writer.writerow(
+                        [phase, int(start), int(end)] + row[:3] +
+                        [round(row[1] / (end - start), 2)
+                         if end > start else None] + row[3:]
+                    )
+
+
+def start_phase_tracking(environment, runner, options):
+    """
+    Records the requests of the ramp-up and steady-state phases separately.
+    The steady state starts --warm-up seconds into the test, or once
+    detected by a SteadyStateDetector with --warm-up auto, and with
+    --warm-up-reset the Locust stats are reset then so its own CSV files
+    leave the ramp-up out. The cool-down starts when the test stops, but as
+    Locust stops every user at once it only holds requests still in flight,
+    and is left out of the CSV file if there are none. Workers send their
+    requests to the master with every report, which counts them in its
+    current phase.
+
+    :param environment: The Locust environment
+    :type environment: locust.env.Environment
+    :param runner: The Locust runner
+    :type runner: locust.runners.Runner
+    :param options: The parsed command line options
+    :type options: argparse.Namespace
+    """
+
+    events = environment.events
+
+    if isinstance(runner, WorkerRunner):
+        counters = soak.RouteCounters()
+
+        def on_request_success(name, response_time, **_kwargs):
+            counters.record(name, response_time)
+
+        def on_request_failure(name, response_time, **_kwargs):
+            counters.record(name, response_time, failed=True)
+
+        def on_report_to_master(data, **_kwargs):
+            data['phase_routes'] = counters.drain()
+
+        events.request_success.add_listener(on_request_success)
+        events.request_failure.add_listener(on_request_failure)
+        events.report_to_master.add_listener(on_report_to_master)
+        return
+
+    phase_stats = PhaseStats()
+    warm_up = None if options.warm_up == 'auto' else options.warm_up
+    detector = SteadyStateDetector(
+        options.steady_window, options.steady_tolerance
+    )
+    phase_loops = list()
+
+    if not isinstance(runner, MasterRunner):
+        def on_local_request_success(name, response_time, **_kwargs):
+            phase_stats.counters[phase_stats.phase].record(
+                name, response_time
+            )
+
+        def on_local_request_failure(name, response_time, **_kwargs):
+            phase_stats.counters[phase_stats.phase].record(
+                name, response_time, failed=True
+            )
+
+        events.request_success.add_listener(on_local_request_success)
+        events.request_failure.add_listener(on_local_request_failure)
+
+    def on_worker_report(data, **_kwargs):
+        phase_stats.counters[phase_stats.phase].merge(
+            data.get('phase_routes', {})
+        )
+
+    def enter_steady_state():
+        phase_stats.enter(STEADY_STATE)
+        logger.info('Steady state reached at %s users, %.2f requests/s',
+                    runner.user_count, environment.stats.total.current_rps)
+        if options.warm_up_reset:
+            environment.stats.reset_all()
+
+    def phase_loop():
+        started = time.time()
+        hatched = False
+        while True:
+            gevent.sleep(1)
+            if phase_stats.phase != RAMP_UP:
+                return
+            now = time.time()
+            # only the first hatch is ramp-up, later user count changes,
+            # i.e. by --target-p95, belong to the steady state
+            hatched = hatched or runner.state == STATE_RUNNING
+            if warm_up is not None:
+                steady = now - started >= warm_up
+            else:
+                steady = detector.add(
+                    now, environment.stats.total.current_rps,
+                    ramping=not hatched
+                )
+            if steady:
+                enter_steady_state()
+
+    def on_test_start(**_kwargs):
+        phase_stats.times[RAMP_UP][0] = time.time()
+        if not phase_loops:
+            phase_loops.append(gevent.spawn(phase_loop))
+
+    def on_test_stop(**_kwargs):
+        if phase_stats.phase != COOL_DOWN:
+            phase_stats.enter(COOL_DOWN)
+
+    def on_quitting(**_kwargs):
+        if STEADY_STATE not in phase_stats.counters:
+            logger.warning('Steady state was not reached, all requests are '
+                           'counted as %s', RAMP_UP)
+        prefix = f'{options.csv_prefix}_' if options.csv_prefix else ''
+        phase_stats.write_csv(f'{prefix}phases.csv')
+
+    events.worker_report.add_listener(on_worker_report)
+    events.test_start.add_listener(on_test_start)
+    events.test_stop.add_listener(on_test_stop)
+    events.quitting.add_listener(on_quitting)
@@ -0,0 +1,342 @@
+""" Run to run performance regression checks over Locust CSV results """
+
+import math
+import utils.results as results
+import utils.utils as utils
+
+# the band of the latency distribution each recorded percentile stands for,
+# the lower half is split between the min and median response times
+PERCENTILE_MASS = [
+    ('Min Response Time', 0.25), ('50%', 0.25), ('66%', 0.16),
+    ('75%', 0.09), ('80%', 0.05), ('90%', 0.10), ('95%', 0.05),
+    ('98%', 0.03), ('99%', 0.01), ('99.9%', 0.009), ('99.99%', 0.0009),
+    ('99.999%', 0.00009), ('100%', 0.00001)
+]
+
+DEFAULT_THRESHOLDS = {
+    'p95_increase_pct': 10.0,
+    'p99_increase_pct': 20.0,
+    'error_rate_increase_pct': 1.0,
+    'throughput_decrease_pct': 10.0,
+    'alpha': 0.05,
+    'min_requests': 30
+}
+
+
+def get_route_distributions(stats_rows):
+    """
+    Groups the rows of a Locust stats CSV by route template and rebuilds an
+    approximate, weighted latency distribution for every route from the
+    recorded percentiles
+
+    :param stats_rows: Rows read with results.read_locust_csv()
+    :type stats_rows: list
+    :return: A dictionary of route -> {'samples': [(latency_ms, weight)],
+             'requests': int, 'failures': int}
+    :rtype: dict
+    """
+
+    routes = dict()
+    for row in stats_rows:
+        route = utils.get_route_template(row['Name'])
+        entry = routes.setdefault(
+            route, {'samples': list(), 'requests': 0, 'failures': 0}
+        )
+        requests = row['Request Count'] or 0
+        entry['requests'] += requests
+        entry['failures'] += row['Failure Count'] or 0
+        for column, mass in PERCENTILE_MASS:
+            if requests and row[column] is not None:
+                entry['samples'].append((float(row[column]), mass * requests))
+
+    return routes
+
+
+def weighted_percentile(samples, percent):
+    """
+    :param samples: A list of (value, weight) tuples
+    :type samples: list
+    :param percent: The percentile to return, i.e. 95
+    :type percent: float
+    :return: The value at the percentile, None if there are no samples
+    :rtype: float
+    """
+
+    total = sum(weight for _, weight in samples)
+    if not total:
+        return None
+    # tolerate float rounding of the summed percentile masses
+    target = total * (percent / 100.0 - 1e-9)
+    cumulative = 0.0
+    for value, weight in sorted(samples):
+        cumulative += weight
+        if cumulative >= target:
+            return value
+
+    return max(value for value, _ in samples)
+
+
+def _normal_sf(z_score):
+    """
+    :return: The one-sided upper tail probability of the standard normal
+    :rtype: float
+    """
+
+    return 0.5 * math.erfc(z_score / math.sqrt(2))
+
+
+def mann_whitney_greater(baseline, candidate):
+    """
+    One-sided Mann-Whitney U test, with weighted samples, that the candidate
+    latencies are stochastically greater than the baseline latencies. Uses
+    the normal approximation, which holds for the request counts of a load
+    test.
+
+    :param baseline: A list of (value, weight) tuples
+    :type baseline: list
+    :param candidate: A list of (value, weight) tuples
+    :type candidate: list
+    :return: The p-value, 1.0 if either sample is empty
+    :rtype: float
+    """
+
+    n_base = sum(weight for _, weight in baseline)
+    n_cand = sum(weight for _, weight in candidate)
+    if not n_base or not n_cand:
+        return 1.0
+
+    merged = sorted(
+        [(value, weight, 0) for value, weight in baseline] +
+        [(value, weight, 1) for value, weight in candidate]
+    )
+    u_stat = 0.0
+    base_below = 0.0
+    idx = 0
+    while idx < len(merged):
+        tie_value = merged[idx][0]
+        tie_base = tie_cand = 0.0
+        while idx < len(merged) and merged[idx][0] == tie_value:
+            if merged[idx][2]:
+                tie_cand += merged[idx][1]
+            else:
+                tie_base += merged[idx][1]
+            idx += 1
+        u_stat += tie_cand * (base_below + 0.5 * tie_base)
+        base_below += tie_base
+
+    mean = n_base * n_cand / 2.0
+    std_dev = math.sqrt(n_base * n_cand * (n_base + n_cand + 1) / 12.0)
+
+    return _normal_sf((u_stat - mean) / std_dev) if std_dev else 1.0
+
+
+def two_proportion_greater(base_fail, base_total, cand_fail, cand_total):
+    """
+    One-sided two proportion z-test that the candidate failure rate is
+    greater than the baseline failure rate
+
+    :return: The p-value, 1.0 if the test is undefined
+    :rtype: float
+    """
+
+    if not base_total or not cand_total:
+        return 1.0
+    pooled = (base_fail + cand_fail) / (base_total + cand_total)
+    std_err = math.sqrt(
+        pooled * (1 - pooled) * (1.0 / base_total + 1.0 / cand_total)
+    )
+    if not std_err:
+        return 1.0
+
+    return _normal_sf(
+        (cand_fail / cand_total - base_fail / base_total) / std_err
+    )
+
+
+def tail_greater(baseline, candidate, threshold):
+    """
+    One-sided test that a larger share of the candidate latencies than of
+    the baseline latencies lies above threshold, i.e. the baseline p99. A
+    two proportion z-test of the weights above threshold, which unlike a
+    test of the whole distribution responds when only the tail moves.
+
+    :param baseline: A list of (value, weight) tuples
+    :type baseline: list
+    :param candidate: A list of (value, weight) tuples
+    :type candidate: list
+    :param threshold: The latency the tail starts above
+    :type threshold: float
+    :return: The p-value, 1.0 if either sample is empty
+    :rtype: float
+    """
+
+    def above(samples):
+        return sum(weight for value, weight in samples if value > threshold)
+
+    return two_proportion_greater(
+        above(baseline), sum(weight for _, weight in baseline),
+        above(candidate), sum(weight for _, weight in candidate)
+    )
+
+
+def welch_less(baseline, candidate):
+    """
+    One-sided Welch t-test that the candidate mean is less than the baseline
+    mean, using the normal approximation of the t distribution
+
+    :param baseline: A list of values
+    :type baseline: list
+    :param candidate: A list of values
+    :type candidate: list
+    :return: The p-value, 1.0 if either sample has fewer than 2 values
+    :rtype: float
+    """
+
+    if len(baseline) < 2 or len(candidate) < 2:
+        return 1.0
+
+    def mean_var(values):
+        mean = sum(values) / len(values)
+        return mean, sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+    base_mean, base_var = mean_var(baseline)
+    cand_mean, cand_var = mean_var(candidate)
+    std_err = math.sqrt(base_var / len(baseline) + cand_var / len(candidate))
+    if not std_err:
+        return 1.0 if cand_mean >= base_mean else 0.0
+
+    return _normal_sf((base_mean - cand_mean) / std_err)
+
+
+def get_throughput_samples(history_rows):
+    """
+    Retrieves the aggregated requests/s recorded once all users were
+    hatched, skipping the ramp-up rows
+
+    :param history_rows: Rows read from a *_stats_history.csv file
+    :type history_rows: list
+    :return: The requests/s samples
+    :rtype: list
+    """
+
+    rows = [
+        row for row in history_rows if row['Name'] == results.AGGREGATED
+    ]
+    if not rows:
+        return list()
+    max_users = max(row['User Count'] or 0 for row in rows)
+
+    return [
+        row['Requests/s'] for row in rows
+        if row['User Count'] == max_users and row['Requests/s'] is not None
+    ]
+
+
+def _pct_change(base, cand):
+    """
+    :return: The percentage change from base to cand, None if undefined
+    :rtype: float
+    """
+
+    if base is None or cand is None or not base:
+        return None
+
+    return (cand - base) / base * 100.0
+
+
+def compare_routes(base_stats, cand_stats, thresholds=None):
+    """
+    Compares the per-route latency and error rate of two runs
+
+    :param base_stats: Rows read from the baseline *_stats.csv file
+    :type base_stats: list
+    :param cand_stats: Rows read from the candidate *_stats.csv file
+    :type cand_stats: list
+    :param thresholds: Overrides of DEFAULT_THRESHOLDS
+    :type thresholds: dict
+    :return: A list of per-route result dictionaries, each with a
+             'regressions' list naming the regressed metrics
+    :rtype: list
+    """
+
+    limits = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    base_routes = get_route_distributions(base_stats)
+    cand_routes = get_route_distributions(cand_stats)
+    report = list()
+    for route in sorted(set(base_routes) | set(cand_routes)):
+        base = base_routes.get(route)
+        cand = cand_routes.get(route)
+        result = {'route': route, 'regressions': list()}
+        report.append(result)
+        if base is None or cand is None:
+            result['note'] = 'only in candidate' if base is None \
+                else 'only in baseline'
+            continue
+        result['requests'] = (base['requests'], cand['requests'])
+        gated = min(result['requests']) >= limits['min_requests']
+        if not gated:
+            result['note'] = 'too few requests to gate'
+        base_rate = base['failures'] / base['requests'] \
+            if base['requests'] else 0.0
+        cand_rate = cand['failures'] / cand['requests'] \
+            if cand['requests'] else 0.0
+        result['error_rate'] = (base_rate * 100.0, cand_rate * 100.0)
+        result['latency_p_value'] = mann_whitney_greater(
+            base['samples'], cand['samples']
+        )
+        for percent, key in ((95, 'p95'), (99, 'p99')):
+            values = (
+                weighted_percentile(base['samples'], percent),
+                weighted_percentile(cand['samples'], percent)
+            )
+            result[key] = values
+            change = _pct_change(*values)
+            if change is None:
+                continue
+            tail_p = tail_greater(base['samples'], cand['samples'], values[0])
+            result[f'{key}_p_value'] = tail_p
+            if gated and change > limits[f'{key}_increase_pct'] and \
+                    tail_p < limits['alpha']:
+                result['regressions'].append(key)
+        error_p = two_proportion_greater(
+            base['failures'], base['requests'],
+            cand['failures'], cand['requests']
+        )
+        if gated and (cand_rate - base_rate) * 100.0 > \
+                limits['error_rate_increase_pct'] and \
+                error_p < limits['alpha']:
+            result['regressions'].append('error_rate')
+
+    return report
+
+
+def compare_throughput(base_history, cand_history, thresholds=None):
+    """
+    Compares the steady aggregated throughput of two runs
+
+    :param base_history: Rows read from the baseline history CSV
+    :type base_history: list
+    :param cand_history: Rows read from the candidate history CSV
+    :type cand_history: list
+    :param thresholds: Overrides of DEFAULT_THRESHOLDS
+    :type thresholds: dict
+    :return: A dictionary of the mean requests/s of each run, the p-value
+             and whether the throughput regressed
+    :rtype: dict
+    """
+
+    limits = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    base = get_throughput_samples(base_history)
+    cand = get_throughput_samples(cand_history)
+    base_mean = sum(base) / len(base) if base else None
+    cand_mean = sum(cand) / len(cand) if cand else None
+    p_value = welch_less(base, cand)
+    change = _pct_change(base_mean, cand_mean)
+
+    return {
+        'requests_per_sec': (base_mean, cand_mean),
+        'p_value': p_value,
+        'regressed': change is not None and
+                     -change > limits['throughput_decrease_pct'] and
+                     p_value < limits['alpha']
+    }
@@ -0,0 +1,251 @@
+""" Readers for the Locust CSV result files stored in results/ """
+
+import csv
+import glob
+import os
+import re
+
+STATS_SUFFIX = '_stats.csv'
+HISTORY_SUFFIX = '_stats_history.csv'
+FAILURES_SUFFIX = '_failures.csv'
+AGGREGATED = 'Aggregated'
+PERCENTILE_COLUMNS = [
+    '50%', '66%', '75%', '80%', '90%', '95%', '98%', '99%', '99.9%',
+    '99.99%', '99.999%', '100%'
+]
+TEXT_COLUMNS = ('Type', 'Method', 'Name', 'Error')
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11,
+    'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60,
+    'seventy': 70, 'eighty': 80, 'ninety': 90
+}
+TIME_UNIT_SECS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+
+def get_run_prefixes(results_dir):
+    """
+    Finds every run in a results directory that has a stats CSV file
+
+    :param results_dir: The directory to search, i.e. results
+    :type results_dir: str
+    :return: The sorted run prefixes, i.e. results/ten_users_four_minutes
+    :rtype: list
+    """
+
+    return sorted(
+        path[:-len(STATS_SUFFIX)]
+        for path in glob.glob(os.path.join(results_dir, f'*{STATS_SUFFIX}'))
+    )
+
+
+def expand_runs(paths):
+    """
+    :param paths: Run prefixes, i.e. results/ten_users_four_minutes, or
+                  directories standing for every run in them
+    :type paths: list
+    :return: The run prefixes
+    :rtype: list
+    """
+
+    runs = list()
+    for path in paths:
+        if os.path.isdir(path):
+            runs.extend(get_run_prefixes(path))
+        else:
+            runs.append(path)
+
+    return runs
+
+
+def format_value(value, spec='.0f'):
+    """
+    :param value: The value to print in a report
+    :type value: float
+    :param spec: The format spec of the value
+    :type spec: str
+    :return: The formatted value, or "-" if value is None
+    :rtype: str
+    """
+
+    return '-' if value is None else format(value, spec)
+
+
+def _parse_number_words(words):
+    """
+    Converts number words, i.e. ['forty', 'five'] or ['hundred'], to an int
+
+    :param words: The number words
+    :type words: list
+    :return: The number, None if no number words are given
+    :rtype: int
+    """
+
+    number = None
+    for word in words:
+        if word == 'hundred':
+            number = (number or 1) * 100
+        else:
+            number = (number or 0) + NUMBER_WORDS[word]
+
+    return number
+
+
+def _parse_run_time(run_time):
+    """
+    Converts a locust --run-time value, i.e. 1h30m or 45s, to seconds
+
+    :param run_time: The --run-time value
+    :type run_time: str
+    :return: The run time in seconds
+    :rtype: int
+    """
+
+    units = {'h': 3600, 'm': 60, 's': 1}
+
+    return sum(
+        int(value) * units[unit]
+        for value, unit in re.findall(r'(\d+)([hms])', run_time)
+    )
+
+
+def get_run_parameters(run):
+    """
+    Retrieves the users, hatch rate and duration of a run. The locust
+    command line is used if it was saved with the run output, i.e.
+    results/one_user_one_minute.txt, otherwise they are parsed from the
+    run name, i.e. forty_five_users_ten_minutes_hrate_three.
+
+    :param run: The run prefix, i.e. results/ten_users_four_minutes
+    :type run: str
+    :return: A dictionary of 'users', 'hatch_rate' and 'run_time_secs', a
+             value is None if it could not be found
+    :rtype: dict
+    """
+
+    params = {'users': None, 'hatch_rate': None, 'run_time_secs': None}
+    if os.path.isfile(f'{run}.txt'):
+        with open(f'{run}.txt', errors='replace') as txt_file:
+            command = txt_file.readline()
+        for key, option, convert in (
+                ('users', r'(?:--user|-u)[ =](\d+)', int),
+                ('hatch_rate', r'(?:--hatch-rate|-r)[ =]([\d.]+)', float),
+                ('run_time_secs', r'(?:--run-time|-t)[ =](\w+)',
+                 _parse_run_time)):
+            match = re.search(option, command)
+            if match:
+                params[key] = convert(match.group(1))
+
+    # i.e. ['forty', 'five', 'users', 'ten', 'minutes', 'hrate', 'three']
+    words = os.path.basename(run).lower().split('_')
+    number_words = list()
+    for idx, word in enumerate(words):
+        if word in NUMBER_WORDS or word == 'hundred':
+            number_words.append(word)
+            continue
+        number = _parse_number_words(number_words)
+        number_words = list()
+        if word.rstrip('s') == 'user' and params['users'] is None:
+            params['users'] = number
+        elif word.rstrip('s') in TIME_UNIT_SECS and number is not None and \
+                params['run_time_secs'] is None:
+            params['run_time_secs'] = number * TIME_UNIT_SECS[word.rstrip('s')]
+        elif word == 'hrate' and params['hatch_rate'] is None:
+            following = list()
+            for next_word in words[idx + 1:]:
+                if next_word not in NUMBER_WORDS and next_word != 'hundred':
+                    break
+                following.append(next_word)
+            if following:
+                params['hatch_rate'] = float(_parse_number_words(following))
+
+    return params
+
+
+def get_run_files(run):
+    """
+    Given a run prefix, i.e. results/ten_users_four_minutes, or the path to
+    any one of its CSV files, finds the stats, history and failures files
+    written by locust --csv for that run
+
+    :param run: The run prefix or the path to one of its CSV files
+    :type run: str
+    :return: A dictionary of 'stats', 'history' and 'failures' paths, a path
+             is None if the file does not exist
+    :rtype: dict
+    """
+
+    prefix = run
+    for suffix in (HISTORY_SUFFIX, STATS_SUFFIX, FAILURES_SUFFIX):
+        if run.endswith(suffix):
+            prefix = run[:-len(suffix)]
+            break
+
+    run_files = dict()
+    for key, suffix in (('stats', STATS_SUFFIX), ('history', HISTORY_SUFFIX),
+                        ('failures', FAILURES_SUFFIX)):
+        path = f'{prefix}{suffix}'
+        run_files[key] = path if os.path.isfile(path) else None
+
+    return run_files
+
+
+def _to_value(value):
+    """
+    Converts a CSV field to an int or float where possible, with the "N/A"
+    sentinel and empty fields converted to None
+
+    :param value: The field value read from the CSV
+    :type value: str
+    :return: The converted value
+    :rtype: int, float, str or None
+    """
+
+    if value in ('', 'N/A'):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def read_csv_header(path):
+    """
+    :param path: The CSV file to read
+    :type path: str
+    :return: The column names of the CSV file, an empty list if it is empty
+    :rtype: list
+    """
+
+    with open(path, newline='') as csv_file:
+        return next(csv.reader(csv_file), list())
+
+
+def read_locust_csv(path, text_columns=TEXT_COLUMNS):
+    """
+    Reads a Locust stats, stats history or failures CSV file, converting
+    numeric fields
+
+    :param path: The CSV file to read
+    :type path: str
+    :param text_columns: Columns always kept as strings
+    :type text_columns: tuple
+    :return: A list of rows as dictionaries keyed by the CSV header
+    :rtype: list
+    """
+
+    rows = list()
+    with open(path, newline='') as csv_file:
+        for row in csv.DictReader(csv_file):
+            rows.append({
+                key: value if key in text_columns else _to_value(value)
+                for key, value in row.items()
+            })
+
+    return rows
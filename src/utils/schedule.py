@@ -0,0 +1,240 @@
+""" Seeded, pre-compiled request schedules replayed from a memory map """
+
+import mmap
+import random
+import struct
+import utils.utils as utils
+
+MAGIC = b'DOGSCHD1'
+# magic, users, requests per user, urls, seed, offset of the first record
+HEADER = struct.Struct('<8sIIIQQ')
+URL_LENGTH = struct.Struct('<H')
+# url index, seconds to wait after the request
+RECORD = struct.Struct('<If')
+# mirrors the @task weights and endpoint choices of DogAPIUser:
+# task name -> (weight, endpoint substring or None for /breeds/list/all,
+#               (min, max) random number of images appended or None)
+TASK_CATALOG = {
+    'list_by_breed': (3, '/list', None),
+    'list_all_breeds': (2, None, None),
+    'get_random_image': (3, '/random', None),
+    'get_random_images': (4, '/random', (2, 60)),
+    'get_list_of_images': (2, '/images', None)
+}
+LIST_ALL_EP = '/breeds/list/all'
+WAIT_TIME = (3, 9)
+
+
+def compile_schedule(list_all_dict, users, requests_per_user, seed=0,
+                     api_path='/api'):
+    """
+    Generates the requests DogAPIUser would make, with the same task
+    weights, endpoint choices and wait times, from a seeded random number
+    generator, so every compile with the same seed gives the same schedule.
+    Every user starts with the /breeds/list/all request of on_start().
+    Raises ValueError if users or requests_per_user is less than 1.
+
+    :param list_all_dict: A dictionary with all breeds retrieved from
+                          json.loads(GET(https://dog.ceo/api/breeds/list/all))
+    :type list_all_dict: dict
+    :param users: The number of user streams to generate
+    :type users: int
+    :param requests_per_user: The number of requests in each user stream
+    :type requests_per_user: int
+    :param seed: The random seed
+    :type seed: int
+    :param api_path: The path the endpoints are under, urls are stored
+                     without the host so the schedule replays against --host
+    :type api_path: str
+    :return: The url table and the records as (url index, wait) tuples,
+             user after user
+    :rtype: tuple
+    """
+
+    if users < 1 or requests_per_user < 1:
+        raise ValueError(
+            f'A schedule needs at least 1 user and 1 request per user, got '
+            f'{users} users and {requests_per_user} requests per user'
+        )
+    rng = random.Random(seed)
+    all_breeds_ep = utils.get_all_available_breed_endpoints_from_list_all(
+        api_path, list_all_dict
+    )
+    task_names = sorted(TASK_CATALOG)
+    weights = [TASK_CATALOG[name][0] for name in task_names]
+    endpoints_by_substr = {
+        substr: [ep for ep in all_breeds_ep if substr in ep]
+        for _, substr, _ in TASK_CATALOG.values() if substr
+    }
+    urls = list()
+    url_index = dict()
+
+    def get_url_index(url):
+        if url not in url_index:
+            url_index[url] = len(urls)
+            urls.append(url)
+        return url_index[url]
+
+    records = list()
+    list_all_idx = get_url_index(f'{api_path}{LIST_ALL_EP}')
+    for _ in range(users):
+        records.append((list_all_idx, rng.uniform(*WAIT_TIME)))
+        for _ in range(requests_per_user - 1):
+            task_name = rng.choices(task_names, weights)[0]
+            _, substr, images = TASK_CATALOG[task_name]
+            if substr is None:
+                url = f'{api_path}{LIST_ALL_EP}'
+            else:
+                url = rng.choice(endpoints_by_substr[substr])
+            if images is not None:
+                url = f'{url}/{rng.randint(*images)}'
+            records.append((get_url_index(url), rng.uniform(*WAIT_TIME)))
+
+    return urls, records
+
+
+def write_schedule(path, urls, records, users, requests_per_user, seed):
+    """
+    Writes a schedule returned by compile_schedule() to a binary file: the
+    header, the url table, then fixed size records grouped by user
+
+    :param path: The file to write
+    :type path: str
+    :param urls: The url table
+    :type urls: list
+    :param records: The (url index, wait) records, user after user
+    :type records: list
+    :param users: The number of user streams
+    :type users: int
+    :param requests_per_user: The number of records of each user
+    :type requests_per_user: int
+    :param seed: The seed the schedule was compiled with
+    :type seed: int
+    """
+
+    url_table = b''.join(
+        URL_LENGTH.pack(len(encoded)) + encoded
+        for encoded in (url.encode('utf-8') for url in urls)
+    )
+    records_offset = HEADER.size + len(url_table)
+    # align the records to their size
+    padding = -records_offset % RECORD.size
+    records_offset += padding
+    with open(path, 'wb') as schedule_file:
+        schedule_file.write(HEADER.pack(
+            MAGIC, users, requests_per_user, len(urls), seed, records_offset
+        ))
+        schedule_file.write(url_table + b'\0' * padding)
+        packed = bytearray(RECORD.size * len(records))
+        for idx, (url_idx, wait) in enumerate(records):
+            RECORD.pack_into(packed, idx * RECORD.size, url_idx, wait)
+        schedule_file.write(packed)
+
+
+class Schedule:
+    """
+    A compiled schedule memory mapped for replay. The url table is decoded
+    once, records are read in place from the map.
+    """
+
+    def __init__(self, path):
+        """
+        Raises ValueError if the file is not a complete compiled schedule.
+
+        :param path: The file written by write_schedule()
+        :type path: str
+        """
+
+        with open(path, 'rb') as schedule_file:
+            self.mapped = mmap.mmap(
+                schedule_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        if len(self.mapped) < HEADER.size:
+            raise ValueError(f'{path} is not a compiled request schedule')
+        magic, self.users, self.requests_per_user, num_urls, self.seed, \
+            self.records_offset = HEADER.unpack_from(self.mapped, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a compiled request schedule')
+        expected_size = self.records_offset + \
+            self.users * self.requests_per_user * RECORD.size
+        if self.users < 1 or self.requests_per_user < 1 or \
+                len(self.mapped) != expected_size:
+            raise ValueError(
+                f'{path} is truncated or corrupt: {self.users} users x '
+                f'{self.requests_per_user} requests need {expected_size} '
+                f'bytes, the file has {len(self.mapped)}'
+            )
+        self.urls = list()
+        offset = HEADER.size
+        for _ in range(num_urls):
+            (length,) = URL_LENGTH.unpack_from(self.mapped, offset)
+            offset += URL_LENGTH.size
+            self.urls.append(
+                self.mapped[offset:offset + length].decode('utf-8')
+            )
+            offset += length
+        self.names = self.urls
+
+    def set_request_names(self, request_names):
+        """
+        Reports requests under their capped route template rather than their
+        url, i.e. in --soak mode. The names are worked out once per url.
+
+        :param request_names: The capped request names
+        :type request_names: utils.soak.CappedNames
+        """
+
+        self.names = [
+            request_names.get(utils.get_route_template(url))
+            for url in self.urls
+        ]
+
+    def get_stream(self, user_id):
+        """
+        :param user_id: The user stream to replay, wrapped around the number
+                        of users in the schedule
+        :type user_id: int
+        :return: The user's stream of requests
+        :rtype: ScheduleStream
+        """
+
+        return ScheduleStream(self, user_id % self.users)
+
+
+class ScheduleStream:
+    """
+    Replays the records of one user of a Schedule, starting over once the
+    last record has been replayed
+    """
+
+    def __init__(self, schedule, user_id):
+        """
+        :param schedule: The memory mapped schedule
+        :type schedule: Schedule
+        :param user_id: The user whose records are replayed
+        :type user_id: int
+        """
+
+        self.schedule = schedule
+        self.start = schedule.records_offset + \
+            user_id * schedule.requests_per_user * RECORD.size
+        self.end = self.start + schedule.requests_per_user * RECORD.size
+        self.offset = self.start
+        self.wait = 0.0
+
+    def next(self):
+        """
+        Moves to the next request of the stream
+
+        :return: The url to request and the name to report it under
+        :rtype: tuple
+        """
+
+        url_idx, self.wait = RECORD.unpack_from(
+            self.schedule.mapped, self.offset
+        )
+        self.offset += RECORD.size
+        if self.offset == self.end:
+            self.offset = self.start
+
+        return self.schedule.urls[url_idx], self.schedule.names[url_idx]
@@ -0,0 +1,404 @@
+""" Memory bounded stats collection for long running Locust soak tests """
+
+import csv
+import os
+import re
+import time
+import gevent
+from locust.runners import MasterRunner, WorkerRunner
+from locust.stats import CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW, \
+    StatsError, calculate_response_time_percentile
+import utils.utils as utils
+
+OTHER_NAME = 'Other'
+AGGREGATED = 'Aggregated'
+WINDOW_PERCENTILES = [0.5, 0.9, 0.95, 0.99, 1.0]
+WINDOW_CSV_HEADER = [
+    'Window Start', 'Window End', 'Name', 'Request Count', 'Failure Count',
+    'Average Response Time', 'Min Response Time', 'Max Response Time',
+    '50%', '90%', '95%', '99%', '100%'
+]
+# seconds of per second request counters kept, StatsEntry.current_rps()
+# looks back at most CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + 2 seconds
+PER_SEC_KEEP_SECS = CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + 10
+URL_PATTERN = re.compile(r'https?://[^\s\'"()]+')
+
+
+def round_response_time(response_time):
+    """
+    Rounds a response time the same way Locust does, i.e. 147 becomes 150
+    and 3432 becomes 3400, which keeps the response time dictionaries small
+
+    :param response_time: The response time in milliseconds
+    :type response_time: float
+    :return: The rounded response time
+    :rtype: int
+    """
+
+    if response_time < 100:
+        return int(round(response_time))
+    if response_time < 1000:
+        return int(round(response_time, -1))
+    if response_time < 10000:
+        return int(round(response_time, -2))
+
+    return int(round(response_time, -3))
+
+
+class CappedNames:
+    """
+    Limits the number of distinct request names, and therefore Locust stats
+    entries, a run can create. Once the cap is reached any new name is
+    reported as OTHER_NAME.
+    """
+
+    def __init__(self, max_entries):
+        """
+        :param max_entries: The maximum number of distinct names
+        :type max_entries: int
+        """
+
+        self.max_entries = max_entries
+        self.names = set()
+
+    def get(self, name):
+        """
+        :param name: The request name to report, i.e. a route template
+        :type name: str
+        :return: name, or OTHER_NAME if the cap has been reached
+        :rtype: str
+        """
+
+        if name in self.names:
+            return name
+        if len(self.names) >= self.max_entries:
+            return OTHER_NAME
+        self.names.add(name)
+
+        return name
+
+
+def _merge_route(routes, name, other):
+    """
+    Adds the route counters of other into routes[name]
+
+    :param routes: The routes, keyed by request name
+    :type routes: dict
+    :param name: The request name
+    :type name: str
+    :param other: The route counters to add, as kept by RouteCounters
+    :type other: list
+    """
+
+    route = routes.get(name)
+    if route is None:
+        route = routes[name] = [0, 0, 0.0, other[3], other[4], dict()]
+    route[0] += other[0]
+    route[1] += other[1]
+    route[2] += other[2]
+    route[3] = min(route[3], other[3])
+    route[4] = max(route[4], other[4])
+    for resp_time, count in other[5].items():
+        route[5][int(resp_time)] = route[5].get(int(resp_time), 0) + count
+
+
+def prune_per_sec_counters(stats, keep_secs=PER_SEC_KEEP_SECS):
+    """
+    Drops the per second request and failure counters Locust keeps for every
+    stats entry for the whole run, keeping only those still used for the
+    current requests/s
+
+    :param stats: The Locust RequestStats instance, i.e. environment.stats
+    :type stats: locust.stats.RequestStats
+    :param keep_secs: The number of most recent seconds to keep
+    :type keep_secs: int
+    """
+
+    oldest = int(time.time()) - keep_secs
+    for entry in list(stats.entries.values()) + [stats.total]:
+        for counters in (entry.num_reqs_per_sec, entry.num_fail_per_sec):
+            for second in [sec for sec in counters if sec < oldest]:
+                del counters[second]
+
+
+def replace_urls(text):
+    """
+    :param text: An error message
+    :type text: str
+    :return: The message with every url replaced by its route template
+    :rtype: str
+    """
+
+    return URL_PATTERN.sub(
+        lambda match: utils.get_route_template(match.group(0)), text
+    )
+
+
+class NormalisedError:
+    """
+    A request error with the urls of its message replaced by their route
+    templates. Its repr() and str() match those of the exception it stands
+    for, so Locust's error report and failures CSV show it the same way.
+    """
+
+    def __init__(self, error):
+        """
+        :param error: The exception the request failed with
+        :type error: Exception
+        """
+
+        self.text = replace_urls(StatsError.parse_error(error))
+        self.message = replace_urls(str(error))
+
+    def __repr__(self):
+        return self.text
+
+    def __str__(self):
+        return self.message
+
+
+def normalise_error(error):
+    """
+    :param error: A request error, as kept by Locust's StatsError, which
+                  is a string on the master
+    :type error: Exception or str
+    :return: The error with every url replaced by its route template, i.e.
+             "503 Server Error: Service Unavailable for url:
+             /api/breed/{breed}/images/random/{n}"
+    :rtype: NormalisedError or str
+    """
+
+    if isinstance(error, str):
+        return replace_urls(error)
+    if isinstance(error, NormalisedError):
+        return error
+
+    return NormalisedError(error)
+
+
+def normalise_errors(stats, max_entries):
+    """
+    Merges the errors Locust keeps per method, request name and message
+    into one entry per route template of the urls in the message. HTTP
+    errors name the url requested, so each /random/{n} url would otherwise
+    get an entry of its own. Errors beyond max_entries distinct entries are
+    merged into one OTHER_NAME entry.
+
+    :param stats: The Locust RequestStats instance, i.e. environment.stats
+    :type stats: locust.stats.RequestStats
+    :param max_entries: The maximum number of distinct errors
+    :type max_entries: int
+    """
+
+    errors = dict()
+    for entry in stats.errors.values():
+        error = normalise_error(entry.error)
+        key = StatsError.create_key(entry.method, entry.name, error)
+        if key not in errors and len(errors) >= max_entries:
+            error = OTHER_NAME
+            key = StatsError.create_key('', OTHER_NAME, error)
+            if key not in errors:
+                errors[key] = StatsError('', OTHER_NAME, error)
+        elif key not in errors:
+            errors[key] = StatsError(entry.method, entry.name, error)
+        errors[key].occurrences += entry.occurrences
+    stats.errors = errors
+
+
+class RouteCounters:
+    """
+    Per route counters of the requests recorded, which can be drained, i.e.
+    by a worker to send to the master, and merged back together.
+
+    Per route [requests, failures, total response time, min response time,
+    max response time, {rounded response time: count}] is kept.
+    """
+
+    def __init__(self):
+        self.routes = dict()
+
+    def record(self, name, response_time, failed=False):
+        """
+        :param name: The request name
+        :type name: str
+        :param response_time: The response time in milliseconds
+        :type response_time: float
+        :param failed: True if the request failed
+        :type failed: bool
+        """
+
+        route = self.routes.get(name)
+        if route is None:
+            route = self.routes[name] = [
+                0, 0, 0.0, response_time, response_time, dict()
+            ]
+        route[0] += 1
+        route[1] += 1 if failed else 0
+        route[2] += response_time
+        route[3] = min(route[3], response_time)
+        route[4] = max(route[4], response_time)
+        rounded = round_response_time(response_time)
+        route[5][rounded] = route[5].get(rounded, 0) + 1
+
+    def drain(self):
+        """
+        Hands over the requests recorded so far and starts over
+
+        :return: The recorded routes
+        :rtype: dict
+        """
+
+        routes, self.routes = self.routes, dict()
+
+        return routes
+
+    def merge(self, routes):
+        """
+        Adds routes drained by other RouteCounters, i.e. a worker's
+
+        :param routes: The routes returned by drain()
+        :type routes: dict
+        """
+
+        for name, other in routes.items():
+            _merge_route(self.routes, name, other)
+
+    def get_rows(self):
+        """
+        :return: A row per route, sorted by name, then an AGGREGATED row, of
+                 [name, requests, failures, average, min and max response
+                 time] followed by the WINDOW_PERCENTILES
+        :rtype: list
+        """
+
+        aggregated = dict()
+        for name in self.routes:
+            _merge_route(aggregated, AGGREGATED, self.routes[name])
+
+        return [
+            [name, count, fails, round(total / count, 2), round(min_rt, 2),
+             round(max_rt, 2)] +
+            [calculate_response_time_percentile(resp_times, count, percent)
+             for percent in WINDOW_PERCENTILES]
+            for name, (count, fails, total, min_rt, max_rt, resp_times)
+            in sorted(self.routes.items()) + list(aggregated.items())
+        ]
+
+
+class SoakWindows(RouteCounters):
+    """
+    Aggregates requests into fixed size time windows. Every closed window is
+    appended to a CSV file and dropped from memory, so the memory used stays
+    flat however long the run is.
+    """
+
+    def __init__(self, path, window_secs):
+        """
+        :param path: The CSV file closed windows are appended to
+        :type path: str
+        :param window_secs: The length of each window in seconds
+        :type window_secs: int
+        """
+
+        super(SoakWindows, self).__init__()
+        self.path = path
+        self.window_secs = window_secs
+        self.window_start = time.time()
+
+    def close_if_due(self, now=None):
+        """
+        Writes and drops the current window if it has ended
+
+        :param now: The current time, defaults to time.time()
+        :type now: float
+        :return: True if a window was closed
+        :rtype: bool
+        """
+
+        now = time.time() if now is None else now
+        if now < self.window_start + self.window_secs:
+            return False
+        self.close(now)
+
+        return True
+
+    def close(self, now=None):
+        """
+        Appends the current window to the CSV file and starts a new one
+
+        :param now: The current time, defaults to time.time()
+        :type now: float
+        """
+
+        now = time.time() if now is None else now
+        rows = self.get_rows() if self.routes else []
+        self.routes = dict()
+        new_file = not os.path.isfile(self.path)
+        with open(self.path, 'a', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            if new_file:
+                writer.writerow(WINDOW_CSV_HEADER)
+            for row in rows:
+                writer.writerow([int(self.window_start), int(now)] + row)
+        self.window_start = now
+
+
+def start_soak_mode(environment, runner, options):
+    """
+    Caps the distinct request names of DogAPIUser and the distinct errors,
+    prunes the per second counters of the Locust stats and records the run
+    in fixed size time windows spilled to disk as they close. Workers send
+    their requests to the master with every report, so only the master or a
+    local runner writes the windows file.
+
+    :param environment: The Locust environment
+    :type environment: locust.env.Environment
+    :param runner: The Locust runner
+    :type runner: locust.runners.Runner
+    :param options: The parsed command line options
+    :type options: argparse.Namespace
+    :return: The capped request names to report requests under
+    :rtype: CappedNames
+    """
+
+    path = f'{options.csv_prefix}_soak_windows.csv' if options.csv_prefix \
+        else 'soak_windows.csv'
+    windows = SoakWindows(path, options.soak_window)
+    events = environment.events
+
+    if not isinstance(runner, MasterRunner):
+        def on_request_success(name, response_time, **_kwargs):
+            windows.record(name, response_time)
+
+        def on_request_failure(name, response_time, **_kwargs):
+            windows.record(name, response_time, failed=True)
+
+        events.request_success.add_listener(on_request_success)
+        events.request_failure.add_listener(on_request_failure)
+
+    if isinstance(runner, WorkerRunner):
+        def on_report_to_master(data, **_kwargs):
+            data['soak_window'] = windows.drain()
+
+        events.report_to_master.add_listener(on_report_to_master)
+    else:
+        def on_worker_report(data, **_kwargs):
+            windows.merge(data.get('soak_window', {}))
+
+        def on_quitting(**_kwargs):
+            normalise_errors(environment.stats, options.soak_max_entries)
+            if windows.routes:
+                windows.close()
+
+        def soak_loop():
+            while True:
+                gevent.sleep(1)
+                normalise_errors(environment.stats, options.soak_max_entries)
+                if windows.close_if_due():
+                    prune_per_sec_counters(environment.stats)
+
+        events.worker_report.add_listener(on_worker_report)
+        events.quitting.add_listener(on_quitting)
+        gevent.spawn(soak_loop)
+
+    return CappedNames(options.soak_max_entries)
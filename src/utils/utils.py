@@ -42,3 +42,31 @@ def get_all_available_breed_endpoints_from_list_all(url, list_all_dict):
             all_endpoints_list.append(f'{ep_k}{ep_v}')
 
     return all_endpoints_list
+
+def get_route_template(name):
+    """
+    Normalises a request name or url, i.e.
+    https://dog.ceo/api/breed/hound/afghan/images/random/12, to the route
+    template it was generated from, i.e.
+    /api/breed/{breed}/{sub_breed}/images/random/{n}, so that stats for
+    every breed and image count of a route can be grouped together.
+
+    :param name: The request name or url to normalise
+    :type name: str
+    :return: The route template, or name unchanged if it is not a Dog API
+             path, i.e. "Aggregated"
+    :rtype: str
+    """
+
+    path = name.split('://', 1)[-1]
+    if '/api/' not in path:
+        return name
+    segments = path[path.index('/api/'):].strip('/').split('/')
+    if len(segments) > 2 and segments[1] == 'breed':
+        segments[2] = '{breed}'
+        if len(segments) > 3 and segments[3] not in ('images', 'list'):
+            segments[3] = '{sub_breed}'
+    if segments[-1].isdigit() and segments[-2] == 'random':
+        segments[-1] = '{n}'
+
+    return '/' + '/'.join(segments)
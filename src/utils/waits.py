@@ -0,0 +1,222 @@
+""" Condition based explicit waits used by the Selenium test cases """
+
+import json
+import time
+from selenium.common.exceptions import NoSuchElementException, \
+    StaleElementReferenceException
+from selenium.webdriver.support.ui import WebDriverWait
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_POLL_FREQUENCY = 0.05
+
+
+class Waiter:
+    """
+    Wraps WebDriverWait with a set of conditions used by the suite and
+    records how long every wait took, so tests continue as soon as the page
+    is ready instead of relying on a global implicitly_wait()
+    """
+
+    def __init__(self, browser, timeout=DEFAULT_TIMEOUT,
+                 poll_frequency=DEFAULT_POLL_FREQUENCY):
+        """
+        :param browser: The webdriver instance to wait on
+        :type browser: selenium.webdriver.remote.webdriver.WebDriver
+        :param timeout: The maximum seconds to wait for any one condition
+        :type timeout: float
+        :param poll_frequency: The seconds to sleep between condition checks
+        :type poll_frequency: float
+        """
+
+        self.browser = browser
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+        self.metrics = list()
+
+    def _until(self, wait_name, condition, message):
+        """
+        Polls the condition until it returns a truthy value, recording the
+        elapsed time of the wait whether it succeeds or times out
+
+        :param wait_name: The name the wait is recorded under in the metrics
+        :type wait_name: str
+        :param condition: Callable taking the webdriver, returns a falsy
+                          value while the condition is not yet met
+        :type condition: callable
+        :param message: The message used if the wait times out
+        :type message: str
+        :return: The value returned by the condition
+        :rtype: object
+        """
+
+        waiter = WebDriverWait(
+            self.browser, self.timeout, poll_frequency=self.poll_frequency,
+            ignored_exceptions=(NoSuchElementException,
+                                StaleElementReferenceException)
+        )
+        start = time.perf_counter()
+        success = False
+        try:
+            result = waiter.until(condition, message)
+            success = True
+        finally:
+            self.metrics.append(
+                (wait_name, time.perf_counter() - start, success)
+            )
+
+        return result
+
+    def for_element(self, by, locator, parent=None):
+        """
+        Waits until an element is present in the page, or under the parent
+        element if one is given
+
+        :param by: The locator strategy, i.e. By.XPATH
+        :type by: str
+        :param locator: The locator value, i.e. '//span[@class="code"]'
+        :type locator: str
+        :param parent: An element to search under instead of the page
+        :type parent: selenium.webdriver.remote.webelement.WebElement
+        :return: The located element
+        :rtype: selenium.webdriver.remote.webelement.WebElement
+        """
+
+        root = parent if parent is not None else self.browser
+
+        return self._until(
+            f'element-present {locator}',
+            lambda _: root.find_element(by, locator),
+            f'Element {locator} not present after {self.timeout}s'
+        )
+
+    def for_elements(self, by, locator, min_count=1):
+        """
+        Waits until at least min_count elements match the locator
+
+        :param by: The locator strategy, i.e. By.XPATH
+        :type by: str
+        :param locator: The locator value
+        :type locator: str
+        :param min_count: The minimum number of elements to wait for
+        :type min_count: int
+        :return: The located elements
+        :rtype: list
+        """
+
+        def condition(driver):
+            elements = driver.find_elements(by, locator)
+            return elements if len(elements) >= min_count else None
+
+        return self._until(
+            f'elements-present {locator}', condition,
+            f'Fewer than {min_count} of {locator} after {self.timeout}s'
+        )
+
+    def for_attribute_change(self, by, locator, attribute, old_value):
+        """
+        Waits until the attribute of the located element differs from
+        old_value. The element is located again on every poll as the page
+        may replace it rather than update it.
+
+        :param by: The locator strategy, i.e. By.XPATH
+        :type by: str
+        :param locator: The locator value
+        :type locator: str
+        :param attribute: The attribute to compare, i.e. 'src'
+        :type attribute: str
+        :param old_value: The attribute value before the change
+        :type old_value: str
+        :return: The new attribute value
+        :rtype: str
+        """
+
+        def condition(driver):
+            value = driver.find_element(by, locator).get_attribute(attribute)
+            return value if value and value != old_value else None
+
+        return self._until(
+            f'attribute-changed {locator}@{attribute}', condition,
+            f'{locator}@{attribute} still {old_value} after {self.timeout}s'
+        )
+
+    def for_window_count_change(self, old_count):
+        """
+        Waits until the number of open windows/tabs differs from old_count
+
+        :param old_count: The number of window handles before the change
+        :type old_count: int
+        :return: The current window handles
+        :rtype: list
+        """
+
+        def condition(driver):
+            handles = driver.window_handles
+            return handles if len(handles) != old_count else None
+
+        return self._until(
+            'window-count-changed', condition,
+            f'Window count still {old_count} after {self.timeout}s'
+        )
+
+    def for_json_text(self, by, locator, strip_chars=None, old_data=None,
+                      key='message'):
+        """
+        Waits until the located element's text parses as JSON and, if
+        old_data is given, until data[key] differs from old_data[key]
+
+        :param by: The locator strategy, i.e. By.CLASS_NAME
+        :type by: str
+        :param locator: The locator value
+        :type locator: str
+        :param strip_chars: Characters to strip from the text before parsing,
+                            i.e. 'JSON\\n'
+        :type strip_chars: str
+        :param old_data: The previously displayed JSON data as a dictionary
+        :type old_data: dict
+        :param key: The key compared against old_data
+        :type key: str
+        :return: The JSON formatted data as a python dictionary
+        :rtype: dict
+        """
+
+        def condition(driver):
+            text = driver.find_element(by, locator).text.strip(strip_chars)
+            try:
+                data = json.loads(text)
+            except ValueError:
+                # text is still being rendered
+                return None
+            if old_data is not None and \
+                    data.get(key) == old_data.get(key):
+                return None
+            return data
+
+        wait_name = 'json-text-changed' if old_data is not None \
+            else 'json-text-present'
+
+        return self._until(
+            f'{wait_name} {locator}', condition,
+            f'{wait_name} {locator} not met after {self.timeout}s'
+        )
+
+    def summary(self):
+        """
+        Totals the recorded waits by name, slowest first
+
+        :return: A list of (wait_name, count, total_secs, max_secs, timeouts)
+        :rtype: list
+        """
+
+        totals = dict()
+        for wait_name, elapsed, success in self.metrics:
+            count, total, longest, timeouts = \
+                totals.get(wait_name, (0, 0.0, 0.0, 0))
+            totals[wait_name] = (
+                count + 1, total + elapsed, max(longest, elapsed),
+                timeouts + (0 if success else 1)
+            )
+
+        return sorted(
+            [(name, *values) for name, values in totals.items()],
+            key=lambda row: row[2], reverse=True
+        )